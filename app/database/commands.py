@@ -0,0 +1,188 @@
+"""Maintenance commands for the database
+
+python -m app.database.commands backfill-fingerprints
+python -m app.database.commands sync-indexes [--drop]
+python -m app.database.commands check-indexes
+python -m app.database.commands rebuild-rollups [--from-date 2025-01-01] [--to-date 2025-02-01]
+python -m app.database.commands check-rollups --from-date 2025-01-01T00:00+07:00 --to-date 2025-02-01 [--user-id ID]
+"""
+import argparse
+import asyncio
+import logging
+import sys
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional, Tuple
+
+from beanie import PydanticObjectId
+from pymongo import UpdateOne
+
+from app.database.factory import initialize
+from app.models.history import History, ApprovalEnum
+from app.models.job import Job
+from app.models.user import User
+from app.helpers.report_cache import naive_utc
+from app.helpers.verdict_cache import url_fingerprint
+from app.helpers.verdict_lookup import lookup_pipeline
+from app.services.history_services import HistoryService
+from app.services.report_services import ReportService
+from app.services.job_services import JobService
+from app.services.rollup_services import RollupService, start_of_day
+from app.models.history_rollup import HistoryRollup
+
+_logger = logging.getLogger(__name__)
+
+
+async def backfill_fingerprints(batch_size: int) -> int:
+    """Sets url_fingerprint on History records written before it existed"""
+    collection = History.get_motor_collection()
+    cursor = collection.find(
+        {"url_fingerprint": None},
+        projection={"original_url": 1},
+        batch_size=batch_size,
+    )
+    updated = 0
+    requests = []
+    async for document in cursor:
+        requests.append(UpdateOne(
+            {"_id": document["_id"]},
+            {"$set": {"url_fingerprint": url_fingerprint(document["original_url"])}},
+        ))
+        if len(requests) >= batch_size:
+            updated += (await collection.bulk_write(requests, ordered=False)).modified_count
+            requests = []
+    if requests:
+        updated += (await collection.bulk_write(requests, ordered=False)).modified_count
+    return updated
+
+
+MODELS = (User, History, Job, HistoryRollup)
+
+
+async def list_indexes() -> dict:
+    return {
+        model.get_collection_name(): set(await model.get_motor_collection().index_information())
+        for model in MODELS
+    }
+
+
+def _declared_indexes(collection: str) -> set:
+    for model in MODELS:
+        if model.get_collection_name() == collection:
+            return {index.document["name"] for index in getattr(model.Settings, "indexes", [])}
+    return set()
+
+
+def service_queries() -> List[Tuple[str, dict, Optional[list]]]:
+    """(name, filter, sort) of every query shape the services send to History"""
+    max_date = datetime.now()
+    min_date = max_date - timedelta(days=30)
+    user_id = str(PydanticObjectId())
+    queries = [
+        ("user_history", HistoryService.build_history_query(min_date, max_date, user_id=user_id)),
+        ("user_history by classifier and status", HistoryService.build_history_query(
+            min_date, max_date, classifier="Phishing", approved_status=ApprovalEnum.Rejected.value, user_id=user_id,
+        )),
+        ("all_history", HistoryService.build_history_query(min_date, max_date)),
+        ("all_history by classifier", HistoryService.build_history_query(min_date, max_date, classifier="Malware")),
+        ("approved_global_history", HistoryService.build_history_query(
+            min_date, max_date, approved_status=ApprovalEnum.Approved.value,
+        )),
+        ("pending_approvals_history", HistoryService.build_history_query(
+            min_date, max_date, approved_status=ApprovalEnum.Pending.value, need_review=True,
+        )),
+        ("recent_approvals_history", HistoryService.build_recent_approval_query()),
+        ("user_report", ReportService.build_report_query(min_date, max_date, user_id)),
+        ("admin_report", ReportService.build_report_query(min_date, max_date)),
+        ("job_results", JobService.build_job_results_query(str(PydanticObjectId()))),
+    ]
+    shapes = [(name, query.get_filter_query(), query.sort_expressions or None) for name, query in queries]
+    verdict_lookup = lookup_pipeline([url_fingerprint("http://example.com")], "v1")[0]["$match"]
+    shapes.append(("verdict_lookup", verdict_lookup, None))
+    return shapes
+
+
+def _plan_stages(plan) -> Iterator[dict]:
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            yield from _plan_stages(value)
+
+
+async def check_indexes() -> List[str]:
+    """Explains every service query, returns the ones planned as a COLLSCAN"""
+    collection = History.get_motor_collection()
+    collection_scans = []
+    for name, query_filter, sort in service_queries():
+        cursor = collection.find(query_filter)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        stages = list(_plan_stages(explain["queryPlanner"]["winningPlan"]))
+        index_names = sorted({stage["indexName"] for stage in stages if "indexName" in stage})
+        if any(stage["stage"] == "COLLSCAN" for stage in stages):
+            collection_scans.append(name)
+            print(f"COLLSCAN {name}: {query_filter}")
+        else:
+            print(f"ok       {name}: {', '.join(index_names) or stages[0]['stage']}")
+    return collection_scans
+
+
+async def main(args: argparse.Namespace):
+    if args.command == "sync-indexes":
+        await initialize(allow_index_dropping=False)
+        before = await list_indexes()
+        await initialize(allow_index_dropping=args.drop)
+        after = await list_indexes()
+        for collection, names in after.items():
+            for name in sorted(names - before[collection]):
+                print(f"created {collection}.{name}")
+            for name in sorted(before[collection] - names):
+                print(f"dropped {collection}.{name}")
+            if not args.drop:
+                for name in sorted(names - {"_id_"} - _declared_indexes(collection)):
+                    print(f"stale   {collection}.{name} (use --drop to remove)")
+        return
+    await initialize()
+    if args.command == "backfill-fingerprints":
+        updated = await backfill_fingerprints(args.batch_size)
+        print(f"{updated} history records fingerprinted")
+    elif args.command == "rebuild-rollups":
+        min_day = start_of_day(naive_utc(args.from_date)) if args.from_date else None
+        max_day = start_of_day(naive_utc(args.to_date)) if args.to_date else None
+        rebuilt = await RollupService.rebuild(min_day, max_day)
+        print(f"{rebuilt} history rollups rebuilt")
+    elif args.command == "check-indexes":
+        collection_scans = await check_indexes()
+        if collection_scans:
+            print(f"{len(collection_scans)} queries fall back to a COLLSCAN")
+            sys.exit(1)
+    elif args.command == "check-rollups":
+        mismatches = await ReportService.check_rollups(args.from_date, args.to_date, args.user_id)
+        for (detection, classifier), (rollup, scanned) in sorted(mismatches.items(), key=str):
+            print(f"mismatch detection={detection} classifier={classifier}: rollups {rollup}, history {scanned}")
+        if mismatches:
+            sys.exit(1)
+        print("rollup report matches a full scan of History")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(prog="python -m app.database.commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    backfill = subparsers.add_parser("backfill-fingerprints", help="fingerprint History records missing one")
+    backfill.add_argument("--batch-size", type=int, default=1_000)
+    sync = subparsers.add_parser("sync-indexes", help="create the declared indexes, optionally drop the others")
+    sync.add_argument("--drop", action="store_true", help="drop indexes no model declares")
+    subparsers.add_parser("check-indexes", help="explain every service query and fail on a COLLSCAN")
+    rebuild = subparsers.add_parser("rebuild-rollups", help="recount the report rollups from History")
+    rebuild.add_argument("--from-date", type=datetime.fromisoformat, help="first day to rebuild")
+    rebuild.add_argument("--to-date", type=datetime.fromisoformat, help="day after the last one to rebuild")
+    check = subparsers.add_parser("check-rollups", help="compare a rollup report with a full scan of History")
+    check.add_argument("--from-date", type=datetime.fromisoformat, required=True, help="report min_date, offsets allowed")
+    check.add_argument("--to-date", type=datetime.fromisoformat, required=True, help="report max_date, offsets allowed")
+    check.add_argument("--user-id", help="check a user report instead of the admin one")
+    asyncio.run(main(parser.parse_args()))
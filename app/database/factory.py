@@ -1,16 +1,23 @@
 import json
 from pathlib import Path
-from typing import Type, Union
+from typing import Optional, Type, Union
 from beanie import init_beanie, Document
 from motor import motor_asyncio
+from pymongo.read_preferences import Primary, make_read_preference, read_pref_mode_from_name
 
 from config.config import get_settings
+from app.helpers.metrics import pool_listeners
 from app.models.user import User
 from app.models.history import History
+from app.models.job import Job
+from app.models.history_rollup import HistoryRollup
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# Database serving analytics_collection, set by initialize
+_analytics_database: Optional[motor_asyncio.AsyncIOMotorDatabase] = None
+
 
 async def init_collection(col: Type[Document], file_path: Union[str, Path]):
     existing_items = await col.find_all(limit=5).to_list()
@@ -33,17 +40,72 @@ async def init_collection(col: Type[Document], file_path: Union[str, Path]):
         _logger.info(f"Successfully init data for collection {col.__name__}")
 
 
-async def initialize():
+def analytics_read_preference():
+    settings = get_settings()
+    return make_read_preference(
+        read_pref_mode_from_name(settings.mongo_analytics_read_preference),
+        None,
+        settings.mongo_analytics_max_staleness_seconds,
+    )
+
+
+def analytics_reads_may_lag() -> bool:
+    """Whether analytics reads may be served by a secondary behind the primary"""
+    settings = get_settings()
+    return bool(settings.mongo_analytics_dsn) or analytics_read_preference() != Primary()
+
+
+def analytics_collection(document: Type[Document]) -> motor_asyncio.AsyncIOMotorCollection:
+    """Collection of document for the heavy report and listing reads, on
+    the MONGO_ANALYTICS_DSN client when set, which may lag the primary"""
+    if _analytics_database is not None:
+        return _analytics_database.get_collection(document.get_collection_name())
+    collection = document.get_motor_collection()
+    read_preference = analytics_read_preference()
+    if read_preference == collection.read_preference:
+        return collection
+    return collection.with_options(read_preference=read_preference)
+
+
+def create_client(dsn: str, name: str, max_pool_size: int) -> motor_asyncio.AsyncIOMotorClient:
+    settings = get_settings()
+    return motor_asyncio.AsyncIOMotorClient(
+        dsn,
+        maxPoolSize=max_pool_size,
+        minPoolSize=settings.mongo_min_pool_size,
+        waitQueueTimeoutMS=settings.mongo_wait_queue_timeout_ms,
+        serverSelectionTimeoutMS=settings.mongo_server_selection_timeout_ms,
+        connectTimeoutMS=settings.mongo_connect_timeout_ms,
+        event_listeners=pool_listeners(name),
+    )
+
+
+async def initialize(allow_index_dropping: Optional[bool] = None):
+    global _analytics_database
+    settings = get_settings()
+    if allow_index_dropping is None:
+        allow_index_dropping = settings.drop_stale_indexes
+
     # CREATE MOTOR CLIENT
-    client = motor_asyncio.AsyncIOMotorClient(get_settings().mongo_dsn, maxPoolSize=5)
+    client = create_client(settings.mongo_dsn, "main", settings.mongo_max_pool_size)
+    if settings.mongo_analytics_dsn:
+        analytics_client = create_client(
+            settings.mongo_analytics_dsn, "analytics", settings.mongo_analytics_max_pool_size
+        )
+        _analytics_database = analytics_client.get_database(
+            client.get_database().name, read_preference=analytics_read_preference()
+        )
 
-    # INIT BEANIE
+    # INIT BEANIE, creates the declared indexes and drops undeclared ones if allowed
     await init_beanie(
         client.get_database(),
         document_models=[
             User,
             History,
+            Job,
+            HistoryRollup,
         ],
+        allow_index_dropping=allow_index_dropping,
     )
 
     # CREATE DATA
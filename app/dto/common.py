@@ -1,4 +1,4 @@
-from typing import Union, List
+from typing import Optional, Union, List
 from pydantic import BaseModel
 
 
@@ -12,7 +12,10 @@ class BaseResponseData(BaseResponse):
 
 
 class BasePaginationResponseData(BaseResponse):
-    total: int = 0
+    total: Optional[int] = 0
+    # eq, gte when total is a lower bound (capped) or approx when estimated
+    total_relation: Optional[str] = None
     page: int = 0
     size: int = 0
-    items: List = []
\ No newline at end of file
+    items: List = []
+    next_cursor: Optional[str] = None
\ No newline at end of file
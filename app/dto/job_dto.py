@@ -0,0 +1,24 @@
+from datetime import datetime
+from typing import Optional
+from beanie import PydanticObjectId
+from pydantic import BaseModel, Field
+
+from app.dto.common import BaseResponseData
+
+class JobResponseData(BaseModel):
+    id: PydanticObjectId = Field(alias='_id')
+    file_name: Optional[str]
+    status: str
+    total_bytes: int
+    bytes_done: int
+    rows_done: int
+    dedupe_ratio: float
+    rows_per_second: Optional[float]
+    eta_seconds: Optional[float]
+    error: Optional[str]
+    created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+
+class JobResponse(BaseResponseData):
+    data: Optional[JobResponseData] = None
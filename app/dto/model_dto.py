@@ -0,0 +1,12 @@
+from typing import List, Optional
+from pydantic import BaseModel
+
+from app.dto.common import BaseResponseData
+
+class ModelRegistryResponseData(BaseModel):
+    active_version: str
+    loaded_version: Optional[str]
+    versions: List[str]
+
+class ModelRegistryResponse(BaseResponseData):
+    data: Optional[ModelRegistryResponseData] = None
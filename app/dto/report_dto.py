@@ -1,13 +1,14 @@
 from datetime import datetime
 from typing import List, Optional
 from beanie import PydanticObjectId
-from pydantic import BaseModel, Field
-from app.dto.common import BaseResponseData
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+from app.dto.common import BaseResponseData, BasePaginationResponseData
 
 class SingleURLRequest(BaseModel):
     url: str
 
 class HistoryResponseDataWihtoutId(BaseModel):
+    model_config = ConfigDict(protected_namespaces=())
     original_url: str
     detection: bool
     classifier: str
@@ -16,10 +17,15 @@ class HistoryResponseDataWihtoutId(BaseModel):
     approved_at: Optional[datetime]
     approved_by: Optional[str]
     created_at: datetime
+    model_version: Optional[str] = None
 
 class HistoryResponseWithoutId(BaseResponseData):
     data: HistoryResponseDataWihtoutId
 
+class HistoryUploadResponse(BasePaginationResponseData):
+    distinct_urls: int = 0
+    dedupe_ratio: float = 0.0
+
 class HistoryResponseData(HistoryResponseDataWihtoutId):
     id: PydanticObjectId = Field(alias='_id')
     original_url: str
@@ -30,6 +36,7 @@ class HistoryResponseData(HistoryResponseDataWihtoutId):
     approved_at: Optional[datetime]
     approved_by: Optional[str]
     created_at: datetime
+    model_version: Optional[str] = None
 
 class HistoryResponse(BaseResponseData):
     data: HistoryResponseData
@@ -45,4 +52,33 @@ class ReportResponseData(BaseModel):
     classifier: List[ClassifierResponseData] = []
 
 class ReportResponse(BaseResponseData):
-    data: ReportResponseData
\ No newline at end of file
+    data: ReportResponseData
+
+class BulkHistoryFilter(BaseModel):
+    min_date: datetime
+    max_date: datetime
+    classifier: Optional[str] = None
+    submitter_id: Optional[str] = None  # admins only
+
+class BulkHistoryRequest(BaseModel):
+    ids: Optional[List[str]] = None
+    filter: Optional[BulkHistoryFilter] = None
+
+    @model_validator(mode="after")
+    def check_target(self):
+        if (self.ids is None) == (self.filter is None):
+            raise ValueError("Give either ids or filter")
+        return self
+
+class BulkHistoryResultData(BaseModel):
+    id: str
+    outcome: str  # updated, not_found, invalid_state or conflict
+
+class BulkHistoryResponseData(BaseModel):
+    updated: int = 0
+    results: List[BulkHistoryResultData] = []
+    # The filter matched more than BULK_MAX_IDS items, send it again for the rest
+    truncated: bool = False
+
+class BulkHistoryResponse(BaseResponseData):
+    data: Optional[BulkHistoryResponseData] = None
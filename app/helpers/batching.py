@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+import pandas as pd
+
+_logger = logging.getLogger(__name__)
+
+
+class InferenceBatcher:
+    """Collects concurrent single url predictions for up to max_wait seconds
+    or max_batch_size urls and scores them with one predict call"""
+
+    def __init__(
+        self,
+        predict: Callable[[pd.DataFrame], Awaitable[pd.DataFrame]],
+        max_batch_size: int,
+        max_wait: float,
+    ):
+        self._predict = predict
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait)
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # The loop only keeps weak references to tasks, a collected batch
+        # task would leave its waiters hanging
+        self._tasks = set()
+        self.batches = 0
+        self.items = 0
+        self.full_batches = 0
+        self.timeout_batches = 0
+        # Batch sizes bucketed by power of two upper bound: 1, 2, 4, 8, ...
+        self.size_histogram = {}
+
+    async def submit(self, url: str) -> Tuple[bool, str, str]:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((url, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush(full=True)
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self, full: bool = False):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        self._record(len(batch), full)
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]):
+        try:
+            prediction_df = await self._predict(pd.DataFrame({'url': [url for url, _ in batch]}))
+        except Exception as e:
+            _logger.error(f"Error in batch prediction: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        detections = prediction_df['detection'].tolist()
+        classifiers = prediction_df['classifier'].tolist()
+        model_versions = prediction_df['model_version'].tolist()
+        for (_, future), detection, classifier, model_version in zip(
+            batch, detections, classifiers, model_versions
+        ):
+            if not future.done():
+                future.set_result((bool(detection), classifier, model_version))
+
+    def _record(self, size: int, full: bool):
+        self.batches += 1
+        self.items += size
+        if full:
+            self.full_batches += 1
+        else:
+            self.timeout_batches += 1
+        bucket = 1 << (size - 1).bit_length()
+        self.size_histogram[bucket] = self.size_histogram.get(bucket, 0) + 1
+
+    def stats(self) -> dict:
+        mean_batch_size = self.items / self.batches if self.batches else 0.0
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait": self.max_wait,
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "items": self.items,
+            "full_batches": self.full_batches,
+            "timeout_batches": self.timeout_batches,
+            "mean_batch_size": mean_batch_size,
+            "mean_fill_ratio": mean_batch_size / self.max_batch_size,
+            "size_histogram": {str(bucket): count for bucket, count in sorted(self.size_histogram.items())},
+        }
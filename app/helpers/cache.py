@@ -0,0 +1,108 @@
+import asyncio
+import time
+from collections import OrderedDict
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Bounded LRU cache with a TTL whose concurrent misses on the same key
+    share a single in-flight computation"""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Any:
+        item = self._items.get(key)
+        if item is None:
+            return _MISSING
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._items[key]
+            self.expirations += 1
+            return _MISSING
+        self._items.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        if self.max_size <= 0:
+            return
+        self._items[key] = (time.monotonic() + self.ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._items.clear()
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drops the entries whose key matches, computations of those keys
+        still running are detached so their now stale result is not kept"""
+        keys = [key for key in self._items if predicate(key)]
+        for key in keys:
+            del self._items[key]
+        for key in [key for key in self._in_flight if predicate(key)]:
+            del self._in_flight[key]
+        self.invalidations += len(keys)
+        return len(keys)
+
+    async def get_or_compute(
+        self,
+        key: Hashable,
+        compute: Callable[[], Awaitable[Any]],
+        cacheable: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """Cached value of key, else the result of compute, which is only
+        kept when cacheable(result) allows it"""
+        value = self.get(key)
+        if value is not _MISSING:
+            self.hits += 1
+            return value
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(compute())
+            self._in_flight[key] = task
+            task.add_done_callback(partial(self._on_done, key, cacheable))
+        # A cancelled caller must not cancel the computation the others wait on
+        return await asyncio.shield(task)
+
+    def _on_done(self, key: Hashable, cacheable: Optional[Callable[[Any], bool]], task: asyncio.Future):
+        if self._in_flight.get(key) is not task:
+            # Invalidated while running
+            return
+        del self._in_flight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        if cacheable is None or cacheable(task.result()):
+            self.set(key, task.result())
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._items),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "in_flight": len(self._in_flight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,69 @@
+"""Offline evaluation of the model cascade, to tune CASCADE_THRESHOLD
+
+For each threshold reports the share of rows the cascade model answers alone,
+how often the cascade agrees with the full ensemble and, when the CSV has a
+label column (benign, defacement, malware, phishing), the accuracy of both and
+their delta:
+python -m app.helpers.cascade_evaluation data.csv --thresholds 0.9 0.95 0.99
+"""
+import argparse
+from typing import Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.helpers.features import extract_features_batch
+from app.helpers.model_registry import ModelBundle, BASE_MODEL_NAMES
+from app.helpers.prediction import registry, CLASS_LABELS
+
+
+def evaluate_cascade(
+    bundle: ModelBundle,
+    urls: Iterable[str],
+    thresholds: List[float],
+    cascade_model: str,
+    labels: Optional[pd.Series] = None,
+) -> pd.DataFrame:
+    features_df = bundle.encode_features(extract_features_batch(urls))
+    # Both stages are scored once, each threshold only picks between them
+    ensemble_preds = bundle.predict_ensemble(features_df)
+    base_preds, confidence = bundle.predict_base(features_df, cascade_model)
+    label_codes = None
+    if labels is not None:
+        label_codes = pd.Categorical(labels.str.capitalize(), dtype=CLASS_LABELS).codes
+        known = label_codes >= 0
+        ensemble_accuracy = (ensemble_preds[known] == label_codes[known]).mean()
+
+    rows = []
+    for threshold in thresholds:
+        short_circuited = confidence >= threshold
+        cascade_preds = np.where(short_circuited, base_preds, ensemble_preds)
+        row = {
+            "threshold": threshold,
+            "short_circuited": short_circuited.mean(),
+            "agreement": (cascade_preds == ensemble_preds).mean(),
+        }
+        if label_codes is not None:
+            row["ensemble_accuracy"] = ensemble_accuracy
+            row["cascade_accuracy"] = (cascade_preds[known] == label_codes[known]).mean()
+            row["accuracy_delta"] = row["cascade_accuracy"] - ensemble_accuracy
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m app.helpers.cascade_evaluation")
+    parser.add_argument("csv", nargs="+", help="url CSV files, optionally with a label column")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.8, 0.9, 0.95, 0.99])
+    parser.add_argument("--model", default="cat_model", choices=BASE_MODEL_NAMES)
+    parser.add_argument("--label-column", default="type")
+    parser.add_argument("--version", help="model version to evaluate, the active one by default")
+    args = parser.parse_args()
+
+    df = pd.concat([pd.read_csv(path, encoding='utf-8', sep=",") for path in args.csv], ignore_index=True)
+    df = df.dropna(subset=['url'])
+    labels = df[args.label_column].astype(str) if args.label_column in df.columns else None
+    bundle = registry.load_bundle(args.version or registry.active_version())
+    report = evaluate_cascade(bundle, df['url'], args.thresholds, args.model, labels)
+    print(f"Model version {bundle.version}, {len(df)} rows, cascade model {args.model}")
+    print(report.to_string(index=False, float_format=lambda value: f"{value:.4f}"))
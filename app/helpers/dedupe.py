@@ -0,0 +1,85 @@
+from typing import Awaitable, Callable, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.helpers.prediction import CLASS_LABELS
+from app.helpers.verdict_cache import normalize_url
+
+
+class DedupeStats:
+    """Rows seen against urls actually scored, the dedupe ratio is the share
+    of rows whose verdict was reused"""
+
+    def __init__(self):
+        self.uploads = 0
+        self.rows = 0
+        self.scored = 0
+
+    def record(self, rows: int, scored: int):
+        self.rows += rows
+        self.scored += scored
+
+    @property
+    def ratio(self) -> float:
+        return 1 - self.scored / self.rows if self.rows else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "uploads": self.uploads,
+            "rows": self.rows,
+            "scored": self.scored,
+            "dedupe_ratio": self.ratio,
+        }
+
+
+class UrlDeduplicator:
+    """Scores each distinct normalized url of one upload once, across all of
+    its chunks, and fans the verdicts back out to every row in row order.
+    Verdicts of up to max_urls distinct urls are kept for later chunks"""
+
+    def __init__(
+        self,
+        predict: Callable[[pd.DataFrame], Awaitable[pd.DataFrame]],
+        max_urls: int,
+        totals: DedupeStats = None,
+    ):
+        self._predict = predict
+        self.max_urls = max(0, max_urls)
+        self._verdicts: Dict[str, Tuple[bool, str, str]] = {}
+        self.totals = totals
+        self.upload = DedupeStats()
+        if totals is not None:
+            totals.uploads += 1
+
+    async def predict(self, df: pd.DataFrame) -> pd.DataFrame:
+        urls = df['url'].tolist()
+        codes, distinct_urls = pd.factorize(pd.Series([normalize_url(url) for url in urls], dtype=object))
+        # Position of the first row of each distinct url, in code order
+        _, first_rows = np.unique(codes, return_index=True)
+
+        known = [self._verdicts.get(url) for url in distinct_urls]
+        unknown = [code for code, verdict in enumerate(known) if verdict is None]
+        if unknown:
+            # Score the url as first written, like a single prediction would
+            prediction_df = await self._predict(pd.DataFrame({'url': [urls[first_rows[code]] for code in unknown]}))
+            for code, detection, classifier, model_version in zip(
+                unknown,
+                prediction_df['detection'].tolist(),
+                prediction_df['classifier'].astype(object).tolist(),
+                prediction_df['model_version'].tolist(),
+            ):
+                known[code] = (detection, classifier, model_version)
+                if len(self._verdicts) < self.max_urls:
+                    self._verdicts[distinct_urls[code]] = known[code]
+
+        detections, classifiers, model_versions = zip(*known)
+        self.upload.record(len(urls), len(unknown))
+        if self.totals is not None:
+            self.totals.record(len(urls), len(unknown))
+        return pd.DataFrame({
+            'url': urls,
+            'detection': np.array(detections, dtype=bool)[codes],
+            'classifier': pd.Categorical(np.array(classifiers, dtype=object)[codes], dtype=CLASS_LABELS),
+            'model_version': np.array(model_versions, dtype=object)[codes],
+        })
@@ -0,0 +1,73 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+from app.helpers.exceptions import ServiceUnavailableException
+
+EXECUTOR_THREAD = "thread"
+EXECUTOR_PROCESS = "process"
+
+
+def _warm_up():
+    # Load the models once per worker process instead of on the first task
+    from app.helpers.prediction import warm_up
+    warm_up()
+
+
+class InferenceExecutor:
+    """Runs CPU bound parsing and inference off the event loop on a bounded
+    thread or process pool, rejecting work once queue_depth tasks are waiting"""
+
+    def __init__(self, kind: str, workers: int, queue_depth: int):
+        if kind not in (EXECUTOR_THREAD, EXECUTOR_PROCESS):
+            raise ValueError(f"Unknown inference executor: {kind}")
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.queue_depth = max(0, queue_depth)
+        self._executor: Optional[Executor] = None
+        self.running = 0
+        self.rejected = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == EXECUTOR_PROCESS:
+                # spawn, forking a process that already runs model thread pools can deadlock
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_warm_up,
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="inference",
+                )
+        return self._executor
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        if self.running >= self.workers + self.queue_depth:
+            self.rejected += 1
+            raise ServiceUnavailableException("Prediction queue is full, please try again later")
+        self.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), partial(func, *args, **kwargs))
+        finally:
+            self.running -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "kind": self.kind,
+            "workers": self.workers,
+            "queue_depth": self.queue_depth,
+            "running": min(self.running, self.workers),
+            "queued": max(0, self.running - self.workers),
+            "rejected": self.rejected,
+        }
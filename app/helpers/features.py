@@ -0,0 +1,165 @@
+import re
+import socket
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+# Column order the ensemble was trained with
+FEATURE_COLUMNS = [
+    'use_of_ip',
+    'suspicious_words',
+    'digit_count',
+    'count_?',
+    'count_@',
+    'no_of_dir',
+    'count-.',
+    'count-www',
+    'count_embedded_domain',
+    'short_url',
+    'count_https',
+    'count_http',
+    'count_%20',
+    'count_dash',
+    'count_equal',
+    'url_length',
+    'hostname_length',
+    'first_dir_length',
+    'top_level_domain',
+    'count_letters',
+]
+
+SUSPICIOUS_KEYWORDS = ['PayPal', 'login', 'signin', 'bank', 'account', 'update', 'bonus', 'ebay']
+SHORTENING_SERVICES = r"(bit\.ly|goo\.gl|shorte\.st|go2l\.ink|x\.co|ow\.ly|tinyurl|tr\.im|is\.gd|cli\.gs|yfrog\.com|migre\.me|ff\.im|tiny\.cc)"
+
+# Single characters counted straight off the byte buffer
+_CHAR_FEATURES = {
+    'count_?': '?',
+    'count_@': '@',
+    'no_of_dir': '/',
+    'count-.': '.',
+    'count_dash': '-',
+    'count_equal': '=',
+}
+# Substrings counted with str.count (non-overlapping semantics)
+_SUBSTRING_FEATURES = {
+    'count-www': 'www',
+    'count_embedded_domain': '//',
+    'count_https': 'https',
+    'count_http': 'http',
+    'count_%20': '%20',
+}
+
+# Byte classes: one per counted character, then digits, letters, non-ascii
+# bytes and the tab/newline characters urlsplit removes
+_BYTE_CLASSES = list(_CHAR_FEATURES) + ['digit_count', 'count_letters', 'non_ascii', 'unsafe', 'other']
+_BYTE_CLASS_TABLE = np.full(256, _BYTE_CLASSES.index('other'), dtype=np.int64)
+for _name, _char in _CHAR_FEATURES.items():
+    _BYTE_CLASS_TABLE[ord(_char)] = _BYTE_CLASSES.index(_name)
+_BYTE_CLASS_TABLE[ord('0'):ord('9') + 1] = _BYTE_CLASSES.index('digit_count')
+_BYTE_CLASS_TABLE[ord('a'):ord('z') + 1] = _BYTE_CLASSES.index('count_letters')
+_BYTE_CLASS_TABLE[ord('A'):ord('Z') + 1] = _BYTE_CLASSES.index('count_letters')
+_BYTE_CLASS_TABLE[0x80:] = _BYTE_CLASSES.index('non_ascii')
+for _char in '\t\r\n':
+    _BYTE_CLASS_TABLE[ord(_char)] = _BYTE_CLASSES.index('unsafe')
+
+_SUSPICIOUS_RE = re.compile('|'.join(re.escape(word.lower()) for word in SUSPICIOUS_KEYWORDS))
+_SHORT_URL_RE = re.compile(SHORTENING_SERVICES)
+
+# Same split as urllib.parse.urlsplit: optional scheme, netloc after '//',
+# path up to the query or fragment and the first directory of that path
+_URL_PARTS_RE = re.compile(
+    r'^(?:([A-Za-z][A-Za-z0-9+.\-]*):)?(?://([^/?#]*))?([^/?#]*(?:/([^/?#]*))?[^?#]*)'
+)
+_C0_CONTROL_OR_SPACE = ''.join(chr(i) for i in range(0x21))
+_UNSAFE_URL_CHARS = ('\t', '\r', '\n')
+_USES_PARAMS = {'', 'ftp', 'hdl', 'prospero', 'http', 'imap', 'https', 'shttp', 'rtsp',
+                'rtsps', 'rtspu', 'sip', 'sips', 'mms', 'sftp', 'tel'}
+
+# urlparse returns a 6-tuple, the models were trained with len() of it
+_URL_LENGTH = 6
+
+
+def _clean_url(url: str) -> str:
+    url = url.lstrip(_C0_CONTROL_OR_SPACE)
+    for c in _UNSAFE_URL_CHARS:
+        url = url.replace(c, '')
+    return url
+
+
+def _is_ip(netloc: str) -> bool:
+    try:
+        socket.inet_aton(netloc)
+        return True
+    except socket.error:
+        return False
+
+
+def _first_dir_length(scheme: Optional[str], path: str, first_dir: Optional[str]) -> int:
+    if first_dir is None:
+        return 0
+    # urlparse strips ';params' from the last path segment
+    if ';' in first_dir and path.count('/') == 1 and (scheme or '').lower() in _USES_PARAMS:
+        return first_dir.find(';')
+    return len(first_dir)
+
+
+def extract_features_batch(urls: Iterable[str]) -> pd.DataFrame:
+    """Column-wise equivalent of extract_features over a whole series of urls"""
+    urls = [str(url) for url in urls]
+    n = len(urls)
+    matrix = np.zeros((n, len(FEATURE_COLUMNS)), dtype=np.int64)
+    column = {name: i for i, name in enumerate(FEATURE_COLUMNS)}
+
+    # Classify every byte of the concatenated utf-8 buffer and count the classes
+    # per row in one bincount, ascii bytes never appear inside multi-byte
+    # sequences so the counts match str.count
+    encoded = [url.encode('utf-8', 'surrogatepass') for url in urls]
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=n)
+    buffer = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    row_ids = np.repeat(np.arange(n, dtype=np.int64), lengths)
+    classes = len(_BYTE_CLASSES)
+    byte_counts = np.bincount(
+        row_ids * classes + _BYTE_CLASS_TABLE[buffer], minlength=n * classes
+    ).reshape(n, classes)
+    for name in list(_CHAR_FEATURES) + ['digit_count', 'count_letters']:
+        matrix[:, column[name]] = byte_counts[:, _BYTE_CLASSES.index(name)]
+    # Unicode digits and letters need str.isdigit/str.isalpha
+    for i in np.flatnonzero(byte_counts[:, _BYTE_CLASSES.index('non_ascii')]):
+        matrix[i, column['digit_count']] = sum(c.isdigit() for c in urls[i])
+        matrix[i, column['count_letters']] = sum(c.isalpha() for c in urls[i])
+
+    for name, substring in _SUBSTRING_FEATURES.items():
+        matrix[:, column[name]] = [url.count(substring) for url in urls]
+    matrix[:, column['suspicious_words']] = [
+        _SUSPICIOUS_RE.search(url.lower()) is not None for url in urls
+    ]
+    matrix[:, column['short_url']] = [_SHORT_URL_RE.search(url) is not None for url in urls]
+    matrix[:, column['url_length']] = _URL_LENGTH
+
+    # urlsplit drops leading controls and tab/newline characters before splitting
+    needs_cleaning = byte_counts[:, _BYTE_CLASSES.index('unsafe')] > 0
+    non_empty = lengths > 0
+    needs_cleaning[non_empty] |= buffer[(np.cumsum(lengths) - lengths)[non_empty]] <= 0x20
+    cleaned = list(urls)
+    for i in np.flatnonzero(needs_cleaning):
+        cleaned[i] = _clean_url(cleaned[i])
+
+    parts = [_URL_PARTS_RE.match(url).groups() for url in cleaned]
+    schemes, netlocs, paths, first_dirs = zip(*parts) if parts else ((), (), (), ())
+    netlocs = [netloc or '' for netloc in netlocs]
+
+    matrix[:, column['hostname_length']] = np.fromiter(map(len, netlocs), dtype=np.int64, count=n)
+    matrix[:, column['first_dir_length']] = [
+        _first_dir_length(scheme, path, first_dir)
+        for scheme, path, first_dir in zip(schemes, paths, first_dirs)
+    ]
+    # inet_aton only accepts values starting with a digit, check each distinct one once
+    ip_netlocs = {
+        netloc for netloc in set(netlocs) if '0' <= netloc[:1] <= '9' and _is_ip(netloc)
+    }
+    matrix[:, column['use_of_ip']] = [netloc in ip_netlocs for netloc in netlocs]
+
+    features_df = pd.DataFrame(matrix, columns=FEATURE_COLUMNS)
+    features_df['top_level_domain'] = [netloc.rpartition('.')[2] for netloc in netlocs]
+    return features_df
@@ -0,0 +1,58 @@
+import threading
+from multiprocessing.connection import Client, Connection
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.helpers.exceptions import ServiceUnavailableException
+
+
+class InferenceClient:
+    """Sends feature matrices to the inference server over its unix socket,
+    one connection per calling thread"""
+
+    def __init__(self, address: str, authkey: bytes):
+        self.address = address
+        self.authkey = authkey
+        self._local = threading.local()
+
+    def _connection(self) -> Connection:
+        connection: Optional[Connection] = getattr(self._local, "connection", None)
+        if connection is None:
+            try:
+                connection = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+            except OSError as e:
+                raise ServiceUnavailableException(f"Inference server is unavailable: {e}")
+            self._local.connection = connection
+        return connection
+
+    def _close(self):
+        connection = getattr(self._local, "connection", None)
+        self._local.connection = None
+        if connection is not None:
+            connection.close()
+
+    def _request(self, *message):
+        # Retry once on a fresh connection, e.g. after the server restarted
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                connection.send(message)
+                status, payload = connection.recv()
+            except (EOFError, OSError) as e:
+                self._close()
+                if attempt:
+                    raise ServiceUnavailableException(f"Inference server is unavailable: {e}")
+                continue
+            if status != "ok":
+                raise RuntimeError(f"Inference server error: {payload}")
+            return payload
+
+    def predict(self, features_df: pd.DataFrame) -> Tuple[np.ndarray, str]:
+        # The server encodes the top level domain with its bundle's vocabulary
+        numeric = features_df.drop(columns='top_level_domain').to_numpy()
+        return self._request("predict", numeric, features_df['top_level_domain'].to_numpy())
+
+    def version(self) -> str:
+        return self._request("version")
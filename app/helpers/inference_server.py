@@ -0,0 +1,76 @@
+"""Local inference server: loads the ensemble once and scores feature
+matrices for every API worker over a unix socket
+
+Start it next to the API with inference_mode=sidecar:
+python -m app.helpers.inference_server
+"""
+import logging
+import os
+import threading
+from multiprocessing.connection import Listener, Connection
+
+import numpy as np
+import pandas as pd
+
+from app.helpers.features import FEATURE_COLUMNS
+from app.helpers.model_registry import verdict_version
+from app.helpers.prediction import registry
+from config.config import get_settings
+
+_logger = logging.getLogger(__name__)
+
+_NUMERIC_COLUMNS = [column for column in FEATURE_COLUMNS if column != 'top_level_domain']
+
+
+def _predict(numeric: np.ndarray, tlds: np.ndarray):
+    features_df = pd.DataFrame(numeric, columns=_NUMERIC_COLUMNS)
+    features_df.insert(FEATURE_COLUMNS.index('top_level_domain'), 'top_level_domain', tlds)
+    settings = get_settings()
+    bundle = registry.get_bundle()
+    return (
+        bundle.predict_classes(features_df, settings.cascade_threshold, settings.cascade_model),
+        verdict_version(bundle.version, settings.cascade_threshold, settings.cascade_model),
+    )
+
+
+def _handle(connection: Connection):
+    with connection:
+        while True:
+            try:
+                command, *args = connection.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                if command == "predict":
+                    connection.send(("ok", _predict(*args)))
+                elif command == "version":
+                    connection.send(("ok", registry.active_version()))
+                else:
+                    connection.send(("error", f"Unknown command {command}"))
+            except (EOFError, OSError):
+                return
+            except Exception as e:
+                _logger.exception("Error in inference request")
+                connection.send(("error", repr(e)))
+
+
+def serve(address: str, authkey: bytes):
+    bundle = registry.get_bundle()
+    if os.path.exists(address):
+        os.unlink(address)
+    with Listener(address, family="AF_UNIX", authkey=authkey) as listener:
+        os.chmod(address, 0o600)
+        _logger.info(f"Inference server for model {bundle.version} listening on {address}")
+        while True:
+            try:
+                connection = listener.accept()
+            except Exception as e:
+                _logger.warning(f"Rejected inference connection: {e}")
+                continue
+            threading.Thread(target=_handle, args=(connection,), daemon=True).start()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    settings = get_settings()
+    serve(settings.inference_socket, settings.secret_key.encode())
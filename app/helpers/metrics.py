@@ -0,0 +1,215 @@
+"""Prometheus metrics of the prediction pipeline, served on /metrics
+
+With METRICS_ENABLED=false nothing is registered and observe_stage/count_rows
+return right away. Under several workers (gunicorn, the process executor or
+the inference sidecar) point PROMETHEUS_MULTIPROC_DIR at a shared, emptied
+directory so /metrics aggregates every process.
+"""
+import os
+import threading
+from contextlib import nullcontext
+from typing import Callable, Dict
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from pymongo import monitoring
+
+from config.config import get_settings
+
+settings = get_settings()
+enabled = settings.metrics_enabled
+
+# Single url stages take well under a millisecond, 100k row files minutes
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+_NULL_CONTEXT = nullcontext()
+
+registry = CollectorRegistry()
+stage_seconds = Histogram(
+    "url_classification_stage_seconds",
+    "Time spent in each prediction stage",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+    registry=registry,
+)
+rows_total = Counter(
+    "url_classification_rows_total",
+    "Rows predicted for clients and rows scored by the models, rate() gives rows per second",
+    ["kind"],
+    registry=registry,
+)
+request_seconds = Histogram(
+    "http_request_duration_seconds",
+    "Request latency per route",
+    ["method", "route", "status"],
+    buckets=STAGE_BUCKETS,
+    registry=registry,
+)
+requests_in_flight = Gauge(
+    "http_requests_in_flight",
+    "Requests being handled per route",
+    ["method", "route"],
+    multiprocess_mode="livesum",
+    registry=registry,
+)
+mongo_checkout_seconds = Histogram(
+    "mongo_pool_checkout_seconds",
+    "Time waited to check a connection out of the Motor pool",
+    ["client", "outcome"],
+    buckets=STAGE_BUCKETS,
+    registry=registry,
+)
+mongo_connections_in_use = Gauge(
+    "mongo_pool_connections_in_use",
+    "Connections checked out of the Motor pool",
+    ["client"],
+    multiprocess_mode="livesum",
+    registry=registry,
+)
+
+
+def observe_stage(stage: str):
+    """Context manager timing one stage into stage_seconds"""
+    if not enabled:
+        return _NULL_CONTEXT
+    return stage_seconds.labels(stage).time()
+
+
+def count_rows(kind: str, rows: int):
+    if enabled and rows:
+        rows_total.labels(kind).inc(rows)
+
+
+class StatsCollector:
+    """Reads the hit counters of an in-process cache's stats() at scrape time"""
+
+    COUNTERS = ("hits", "misses", "coalesced", "evictions", "expirations", "invalidations")
+
+    def __init__(self, name: str, stats: Callable[[], dict]):
+        self.name = name
+        self.stats = stats
+
+    def collect(self):
+        stats = self.stats()
+        for key in self.COUNTERS:
+            if key in stats:
+                yield CounterMetricFamily(f"{self.name}_{key}", f"Cache {key}", value=stats[key])
+        if "size" in stats:
+            yield GaugeMetricFamily(f"{self.name}_size", "Cached entries", value=stats["size"])
+
+
+_stats_collectors = []
+
+
+def register_stats(name: str, stats: Callable[[], dict]):
+    """Exposes the counters of stats(), the hit ratio is hits / (hits + misses + coalesced)"""
+    if enabled:
+        collector = StatsCollector(name, stats)
+        _stats_collectors.append(collector)
+        registry.register(collector)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        collector_registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(collector_registry)
+        # Caches live per process, these are the values of the scraped worker
+        for collector in _stats_collectors:
+            collector_registry.register(collector)
+        return generate_latest(collector_registry), CONTENT_TYPE_LATEST
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class PoolCheckoutListener(monitoring.ConnectionPoolListener):
+    """Records how long operations of one Motor client wait for a pooled
+    Mongo connection and how many connections they hold"""
+
+    def __init__(self, client: str):
+        self.client = client
+        # Events come from the driver's threads
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.failures: Dict[str, int] = {}
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.open = 0
+
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+            if event.duration is not None:
+                self.wait_seconds += event.duration
+                self.max_wait_seconds = max(self.max_wait_seconds, event.duration)
+        if enabled:
+            mongo_connections_in_use.labels(self.client).inc()
+            if event.duration is not None:
+                mongo_checkout_seconds.labels(self.client, "success").observe(event.duration)
+
+    def connection_check_out_failed(self, event: monitoring.ConnectionCheckOutFailedEvent):
+        with self._lock:
+            self.failures[event.reason] = self.failures.get(event.reason, 0) + 1
+        if enabled and event.duration is not None:
+            mongo_checkout_seconds.labels(self.client, event.reason).observe(event.duration)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.in_use -= 1
+        if enabled:
+            mongo_connections_in_use.labels(self.client).dec()
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open -= 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "failures": dict(self.failures),
+                "mean_wait_seconds": self.wait_seconds / self.checkouts if self.checkouts else 0.0,
+                "max_wait_seconds": self.max_wait_seconds,
+                "in_use": self.in_use,
+                "max_in_use": self.max_in_use,
+                "open": self.open,
+            }
+
+
+_pool_listeners: Dict[str, PoolCheckoutListener] = {}
+
+
+def pool_listeners(client: str = "main") -> list:
+    listener = _pool_listeners.setdefault(client, PoolCheckoutListener(client))
+    return [listener]
+
+
+def get_pool_stats() -> dict:
+    """Checkout stats of this process per Motor client"""
+    return {client: listener.stats() for client, listener in _pool_listeners.items()}
@@ -0,0 +1,241 @@
+"""Versioned ensemble bundles and the pointer to the active one
+
+A bundle is a directory of the registry holding a manifest.json:
+{
+    "version": "v2",
+    "models": {
+        "cat_model": {"path": "cat_model.cbm", "format": "catboost"},
+        "xgb_model": {"path": "xgb_model.json", "format": "xgboost"},
+        "lgb_model": {"path": "lgb_model.txt", "format": "lightgbm"},
+        "rf_model": {"path": "rf_model.pkl", "format": "pickle"}
+    },
+    "tld_vocabulary": "tld_vocabulary.json"
+}
+The ACTIVE file of the registry names the bundle to serve. Every process
+holding models polls it and swaps to a new bundle only once it is loaded
+and warmed, so predictions keep flowing during a rollout.
+"""
+import json
+import logging
+import os
+import pickle
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from app.helpers.features import extract_features_batch
+from app.helpers.metrics import observe_stage
+from app.helpers.tld_vocabulary import load_tld_vocabulary, encode_top_level_domain
+
+_logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+ACTIVE_FILE = "ACTIVE"
+MODEL_NAMES = ["cat_model", "xgb_model", "lgb_model", "rf_model"]
+BASE_MODEL_NAMES = ["cat_model", "xgb_model", "lgb_model"]
+
+
+def verdict_version(version: str, cascade_threshold: float = 0.0, cascade_model: str = "cat_model") -> str:
+    """Model version recorded on the verdicts of a bundle. Cascade verdicts
+    carry the cascade config, e.g. v1+cascade:cat_model@0.9, so the verdict
+    cache and the History lookup never serve them as full ensemble ones"""
+    if cascade_threshold <= 0:
+        return version
+    return f"{version}+cascade:{cascade_model}@{cascade_threshold:g}"
+
+
+class LightGBMBooster:
+    """Gives a native lightgbm Booster the predict() of LGBMClassifier"""
+
+    def __init__(self, booster):
+        self.booster = booster
+
+    @property
+    def classes_(self) -> np.ndarray:
+        return np.arange(max(2, self.booster.num_model_per_iteration()))
+
+    def predict_proba(self, features) -> np.ndarray:
+        probabilities = self.booster.predict(features)
+        if probabilities.ndim == 1:
+            return np.column_stack((1 - probabilities, probabilities))
+        return probabilities
+
+    def predict(self, features):
+        return self.predict_proba(features).argmax(axis=1)
+
+
+def load_model(path: Path, model_format: str):
+    if model_format == "pickle":
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    if model_format == "catboost":
+        from catboost import CatBoostClassifier
+        model = CatBoostClassifier()
+        model.load_model(str(path))
+        return model
+    if model_format == "xgboost":
+        from xgboost import XGBClassifier
+        model = XGBClassifier()
+        model.load_model(str(path))
+        return model
+    if model_format == "lightgbm":
+        import lightgbm
+        return LightGBMBooster(lightgbm.Booster(model_file=str(path)))
+    raise ValueError(f"Unknown model format: {model_format}")
+
+
+class ModelBundle:
+    def __init__(self, version: str, models: Dict[str, object], tld_vocabulary: pd.Index):
+        self.version = version
+        self.models = models
+        self.tld_vocabulary = tld_vocabulary
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "ModelBundle":
+        path = Path(path)
+        with open(path / MANIFEST_FILE, encoding="utf-8") as f:
+            manifest = json.load(f)
+        models = {}
+        for name in MODEL_NAMES:
+            model = manifest["models"][name]
+            models[name] = load_model(path / model["path"], model.get("format", "pickle"))
+        tld_vocabulary = load_tld_vocabulary(path / manifest["tld_vocabulary"])
+        return cls(manifest.get("version", path.name), models, tld_vocabulary)
+
+    def encode_features(self, features_df: pd.DataFrame) -> pd.DataFrame:
+        # Encode the 'top level domain' feature
+        features_df = features_df.copy()
+        features_df['top_level_domain'] = encode_top_level_domain(
+            features_df['top_level_domain'], self.tld_vocabulary
+        )
+        return features_df
+
+    def predict_classes(
+        self,
+        features_df: pd.DataFrame,
+        cascade_threshold: float = 0.0,
+        cascade_model: str = "cat_model",
+    ) -> np.ndarray:
+        """Scores with the stacked ensemble. With a cascade_threshold above 0
+        cascade_model scores every row first and only the rows whose top class
+        probability is below the threshold go through the full ensemble"""
+        features_df = self.encode_features(features_df)
+        if cascade_threshold <= 0:
+            return self.predict_ensemble(features_df)
+        preds, confidence = self.predict_base(features_df, cascade_model)
+        uncertain = confidence < cascade_threshold
+        if uncertain.any():
+            preds[uncertain] = self.predict_ensemble(features_df[uncertain])
+        return preds
+
+    def predict_base(self, features_df: pd.DataFrame, model_name: str):
+        """Classes and top class probabilities of one base model on encoded features"""
+        if model_name not in BASE_MODEL_NAMES:
+            raise ValueError(f"Unknown base model: {model_name}")
+        model = self.models[model_name]
+        with observe_stage("cascade"):
+            probabilities = model.predict_proba(features_df)
+        preds = np.asarray(model.classes_)[probabilities.argmax(axis=1)].astype(np.int64)
+        return preds, probabilities.max(axis=1)
+
+    def predict_ensemble(self, features_df: pd.DataFrame) -> np.ndarray:
+        # Predict using all models
+        with observe_stage("cat_model"):
+            cat_preds = self.models["cat_model"].predict(features_df).reshape(-1, 1)
+        with observe_stage("xgb_model"):
+            xgb_preds = self.models["xgb_model"].predict(features_df).reshape(-1, 1)
+        with observe_stage("lgb_model"):
+            lgb_preds = self.models["lgb_model"].predict(features_df).reshape(-1, 1)
+
+        # Meta input in order of XGBoost, LightGBM, CatBoost
+        meta_inputs = np.hstack((xgb_preds, lgb_preds, cat_preds))
+        with observe_stage("rf_model"):
+            return self.models["rf_model"].predict(meta_inputs)
+
+    def warm_up(self):
+        self.predict_classes(extract_features_batch(["http://www.example.com/warm-up?q=1"]))
+
+
+class ModelRegistry:
+    def __init__(self, root: Union[str, Path], poll_interval: float):
+        self.root = Path(root)
+        self.poll_interval = poll_interval
+        self._bundle: Optional[ModelBundle] = None
+        self._lock = threading.Lock()
+        self._loading: Optional[str] = None
+        self._failed: Optional[str] = None
+        self._active: Optional[str] = None
+        self._active_checked_at = 0.0
+
+    def list_versions(self) -> List[str]:
+        return sorted(
+            path.name for path in self.root.iterdir()
+            if (path / MANIFEST_FILE).is_file()
+        )
+
+    def active_version(self) -> str:
+        # The pointer is re-read at most every poll_interval seconds
+        now = time.monotonic()
+        if self._active is None or now - self._active_checked_at >= self.poll_interval:
+            self._active = (self.root / ACTIVE_FILE).read_text(encoding="utf-8").strip()
+            self._active_checked_at = now
+        return self._active
+
+    def loaded_version(self) -> Optional[str]:
+        return self._bundle.version if self._bundle is not None else None
+
+    def load_bundle(self, version: str) -> ModelBundle:
+        if version not in self.list_versions():
+            raise ValueError(f"Unknown model version: {version}")
+        bundle = ModelBundle.load(self.root / version)
+        bundle.warm_up()
+        return bundle
+
+    def get_bundle(self) -> ModelBundle:
+        version = self.active_version()
+        if self._bundle is None:
+            # Nothing to serve yet, the first load has to block
+            with self._lock:
+                if self._bundle is None:
+                    self._bundle = self.load_bundle(version)
+        elif self._bundle.version != version:
+            self._swap_in_background(version)
+        return self._bundle
+
+    def _swap_in_background(self, version: str):
+        with self._lock:
+            if version in (self._loading, self._failed):
+                return
+            self._loading = version
+        threading.Thread(target=self._swap, args=(version,), daemon=True).start()
+
+    def _swap(self, version: str):
+        try:
+            bundle = self.load_bundle(version)
+            self._bundle = bundle
+            _logger.info(f"Swapped to model version {version}")
+        except Exception:
+            # Keep serving the current bundle until ACTIVE changes again
+            _logger.exception(f"Failed to load model version {version}")
+            self._failed = version
+        finally:
+            with self._lock:
+                self._loading = None
+
+    def activate(self, version: str, load: bool = True):
+        """Validates the bundle, optionally serves it right away from this
+        process, then points every other process at it"""
+        if version not in self.list_versions():
+            raise ValueError(f"Unknown model version: {version}")
+        if load:
+            self._bundle = self.load_bundle(version)
+        pointer = self.root / f"{ACTIVE_FILE}.tmp"
+        pointer.write_text(f"{version}\n", encoding="utf-8")
+        os.replace(pointer, self.root / ACTIVE_FILE)
+        self._active = version
+        self._active_checked_at = time.monotonic()
+        self._failed = None
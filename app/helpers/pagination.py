@@ -0,0 +1,53 @@
+"""Opaque cursors for keyset pagination
+
+A cursor holds the sort key values of the last item of a page, the next page
+is everything strictly after it in sort order, found through the index
+instead of skipping over every earlier row.
+"""
+import base64
+import binascii
+from typing import Any, List, Optional, Tuple
+
+from bson import json_util
+from bson.errors import InvalidBSON
+
+from app.helpers.exceptions import BadRequestException
+
+# Sort keys as (field, direction) pairs, direction 1 or -1, the last one unique
+SortKeys = List[Tuple[str, int]]
+
+
+def encode_cursor(values: List[Any]) -> str:
+    data = json_util.dumps(values).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_keys: SortKeys) -> List[Any]:
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json_util.loads(data)
+    except (binascii.Error, ValueError, InvalidBSON):
+        raise BadRequestException("Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(sort_keys):
+        raise BadRequestException("Invalid cursor")
+    return values
+
+
+def keyset_filter(sort_keys: SortKeys, values: List[Any]) -> dict:
+    """Matches the documents sorted after values: for keys (a, b) that is
+    a after values[0], or a equal to it and b after values[1]"""
+    branches = []
+    for position, (field, direction) in enumerate(sort_keys):
+        branch = {key: value for (key, _), value in zip(sort_keys[:position], values)}
+        branch[field] = {"$gt" if direction > 0 else "$lt": values[position]}
+        branches.append(branch)
+    return {"$or": branches}
+
+
+def next_cursor(items: list, size: int, sort_keys: SortKeys) -> Optional[str]:
+    """Cursor after the last item when the page is full, items hold the
+    projected documents with their sort fields as attributes"""
+    if len(items) < size or not items:
+        return None
+    last = items[-1]
+    return encode_cursor([getattr(last, "id" if field == "_id" else field) for field, _ in sort_keys])
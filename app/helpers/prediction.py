@@ -1,21 +1,46 @@
-import pickle
+from typing import BinaryIO, Iterator, Tuple, Union
 import pandas as pd
 import numpy as np
 from urllib.parse import urlparse
-from sklearn.preprocessing import LabelEncoder
+
+from app.helpers.features import extract_features_batch
+from app.helpers.model_registry import ModelRegistry, verdict_version
+from app.helpers.inference_client import InferenceClient
+from app.helpers.metrics import observe_stage, count_rows
+from app.helpers.verdict_cache import normalize_url
+from config.config import get_settings
 
 import re
 import socket
 
-# Load models
-with open("ml_models/cat_model.pkl", "rb") as f:
-    cat_model = pickle.load(f)
-with open("ml_models/xgb_model.pkl", "rb") as f:
-    xgb_model = pickle.load(f)
-with open("ml_models/lgb_model.pkl", "rb") as f:
-    lgb_model = pickle.load(f)
-with open("ml_models/rf_model.pkl", "rb") as f:
-    rf_model = pickle.load(f)
+settings = get_settings()
+
+INFERENCE_LOCAL = "local"
+INFERENCE_SIDECAR = "sidecar"
+
+registry = ModelRegistry(settings.model_registry_path, settings.model_registry_poll_seconds)
+_inference_client = None
+
+def get_inference_client() -> InferenceClient:
+    global _inference_client
+    if _inference_client is None:
+        _inference_client = InferenceClient(settings.inference_socket, settings.secret_key.encode())
+    return _inference_client
+
+def get_model_version() -> str:
+    # Version scoring in this process, which lags ACTIVE while a new bundle
+    # loads or after it failed to. Until one is loaded here (process executor
+    # and sidecar workers score elsewhere) the best guess is ACTIVE
+    return verdict_version(
+        registry.loaded_version() or registry.active_version(),
+        settings.cascade_threshold,
+        settings.cascade_model,
+    )
+
+def warm_up():
+    # Workers scoring through the sidecar never load the models
+    if settings.inference_mode != INFERENCE_SIDECAR:
+        registry.get_bundle()
 
 def extract_features(url: str):
     features = {}
@@ -104,51 +129,39 @@ def extract_features(url: str):
 
     return features
 
-def label_decoder(label):
-    if label == 0:
-        return "Benign"
-    elif label == 1:
-        return "Defacement"
-    elif label == 2:
-        return "Malware"
-    elif label == 3:
-        return "Phishing"
-
-def detection_decoder(label):
-    if label == "Benign":
-        return False
-    else:
-        return True
+def read_url_csv(file: Union[str, BinaryIO], chunksize: int) -> Iterator[pd.DataFrame]:
+    # Only the url column is parsed, a file without one raises ValueError.
+    # Read as text, a chunk of numeric looking urls would otherwise be stored
+    # as numbers History cannot load back
+    return pd.read_csv(file, encoding='utf-8', sep=",", usecols=['url'], dtype={'url': str}, chunksize=chunksize)
+
+# Class index of the RF meta-model to label
+CLASS_LABELS = pd.CategoricalDtype(["Benign", "Defacement", "Malware", "Phishing"])
+BENIGN_CLASS = 0
+
+def predict_classes(features_df: pd.DataFrame) -> Tuple[np.ndarray, str]:
+    if settings.inference_mode == INFERENCE_SIDECAR:
+        return get_inference_client().predict(features_df)
+    bundle = registry.get_bundle()
+    return (
+        bundle.predict_classes(features_df, settings.cascade_threshold, settings.cascade_model),
+        verdict_version(bundle.version, settings.cascade_threshold, settings.cascade_model),
+    )
 
 def get_prediction(df: pd.DataFrame) -> pd.DataFrame:
-    # Preprocess data
-    feature_list = []
-    for url in df['url']:
-        feature_list.append(extract_features(url))
-    features_df = pd.DataFrame(feature_list)
-
-    # Encode the 'top level domain' feature
-    le = LabelEncoder()
-    features_df['top_level_domain'] = le.fit_transform(features_df['top_level_domain'])
-
-    # Predict using all models
-    cat_preds = cat_model.predict(features_df)
-    xgb_preds = xgb_model.predict(features_df).reshape(-1, 1)
-    lgb_preds = lgb_model.predict(features_df).reshape(-1, 1)
+    # Preprocess data, on the url the verdict cache and History are keyed on
+    with observe_stage("features"):
+        features_df = extract_features_batch(df['url'].map(normalize_url, na_action='ignore'))
 
-    # Meta input in order of XGBoost, LightGBM, CatBoost
-    meta_inputs = np.hstack((xgb_preds, lgb_preds, cat_preds))
-    rf_preds = rf_model.predict(meta_inputs)
+    with observe_stage("models"):
+        rf_preds, model_version = predict_classes(features_df)
+    count_rows("scored", len(rf_preds))
 
     # Create result df
-    result_df = pd.DataFrame(columns=["url", "detection", "classifier"])
-    result_df['url'] = df['url']
-    result_df['classifier'] = rf_preds
-    
-    for i in range(len(result_df)):
-        classifier = label_decoder(result_df.loc[i, 'classifier'])
-        detection = detection_decoder(classifier)
-        result_df.loc[i, 'classifier'] = classifier
-        result_df.loc[i, 'detection'] = detection
-
-    return result_df
\ No newline at end of file
+    result_df = pd.DataFrame({
+        'url': df['url'].to_numpy(),
+        'detection': rf_preds != BENIGN_CLASS,
+        'classifier': pd.Categorical.from_codes(rf_preds, dtype=CLASS_LABELS),
+        'model_version': model_version,
+    })
+    return result_df
@@ -0,0 +1,74 @@
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Hashable, Optional, Tuple
+
+from app.helpers.cache import TTLCache
+
+SCOPE_USER = "user"
+SCOPE_ADMIN = "admin"
+
+
+def naive_utc(value: datetime) -> datetime:
+    # History dates are stored naive, Mongo compares aware ones in UTC
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _affects(key: Hashable, first: datetime, last: datetime, user_id: Optional[str], admin: bool) -> bool:
+    scope, key_user_id, min_date, max_date = key
+    if min_date > last or max_date < first:
+        return False
+    if scope == SCOPE_ADMIN:
+        return admin
+    return user_id is not None and key_user_id == user_id
+
+
+class ReportCache(TTLCache):
+    """Report data keyed by (scope, user_id, min_date, max_date). A write
+    only drops the reports whose date range holds the rows it changed, other
+    workers see it once their entries expire after ttl seconds.
+
+    When reports are read from secondaries a recompute right after a write
+    may not see it yet, so for settle_seconds after an invalidation the
+    reports it covered are recomputed on every request instead of cached"""
+
+    def __init__(self, max_size: int, ttl: float, settle_seconds: float = 0):
+        super().__init__(max_size, ttl)
+        self.settle_seconds = settle_seconds
+        # (invalidated at, first, last, user_id, admin), oldest first
+        self._settling: Deque[Tuple[float, datetime, datetime, Optional[str], bool]] = deque()
+        self.unsettled = 0
+
+    @staticmethod
+    def report_key(min_date: datetime, max_date: datetime, user_id: Optional[str]) -> Tuple:
+        scope = SCOPE_USER if user_id is not None else SCOPE_ADMIN
+        return scope, user_id, naive_utc(min_date), naive_utc(max_date)
+
+    def invalidate_window(
+        self,
+        first: datetime,
+        last: datetime,
+        user_id: Optional[str] = None,
+        admin: bool = False,
+    ) -> int:
+        """Drops the reports of user_id, and the admin ones if admin, whose
+        range overlaps the created_at window [first, last] of the changed rows"""
+        first, last = naive_utc(first), naive_utc(last)
+        if self.settle_seconds > 0:
+            self._settling.append((time.monotonic(), first, last, user_id, admin))
+        return self.invalidate(lambda key: _affects(key, first, last, user_id, admin))
+
+    def set(self, key: Hashable, value: Any):
+        if self._settling:
+            settled_before = time.monotonic() - self.settle_seconds
+            while self._settling and self._settling[0][0] <= settled_before:
+                self._settling.popleft()
+            if any(_affects(key, *window) for _, *window in self._settling):
+                self.unsettled += 1
+                return
+        super().set(key, value)
+
+    def stats(self) -> dict:
+        return {**super().stats(), "settle_seconds": self.settle_seconds, "unsettled": self.unsettled}
@@ -0,0 +1,56 @@
+"""Fixed top level domain vocabulary used to encode the top_level_domain feature
+
+The vocabulary is a sorted JSON list shipped with each model bundle, a TLD is
+encoded as its position in that list (the same ordering LabelEncoder uses) and
+anything outside of it as UNKNOWN_TLD_CODE, so every batch encodes the same way.
+
+Merge the TLDs of one or more url CSV files into a bundle's vocabulary with:
+python -m app.helpers.tld_vocabulary ml_models/v1/tld_vocabulary.json data.csv [more.csv ...]
+"""
+import json
+import sys
+from pathlib import Path
+from typing import Iterable, List, Union
+
+import numpy as np
+import pandas as pd
+
+from app.helpers.features import extract_features_batch
+
+UNKNOWN_TLD_CODE = -1
+
+_TLD_LABEL_RE = r"[a-z]{2,63}|xn--[a-z0-9-]+"
+
+
+def load_tld_vocabulary(path: Union[str, Path]) -> pd.Index:
+    with open(path, encoding="utf-8") as f:
+        return pd.Index(json.load(f))
+
+
+def encode_top_level_domain(tlds: Iterable[str], vocabulary: pd.Index) -> np.ndarray:
+    # Categorical codes are -1 (UNKNOWN_TLD_CODE) for values outside the categories
+    codes = pd.Categorical(pd.Series(tlds, dtype=object).str.lower(), categories=vocabulary).codes
+    return codes.astype(np.int64)
+
+
+def build_tld_vocabulary(urls: Iterable[str], base: Iterable[str] = ()) -> List[str]:
+    tlds = extract_features_batch(urls)['top_level_domain'].str.lower()
+    # Ports and IP octets also end up in the feature, only keep real labels
+    tlds = tlds[tlds.str.fullmatch(_TLD_LABEL_RE)]
+    return sorted(set(base) | set(tlds))
+
+
+def save_tld_vocabulary(vocabulary: List[str], path: Union[str, Path]):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(vocabulary, f, indent=0)
+        f.write("\n")
+
+
+if __name__ == "__main__":
+    vocabulary_path, *csv_paths = sys.argv[1:]
+    vocabulary = list(load_tld_vocabulary(vocabulary_path))
+    for csv_path in csv_paths:
+        df = pd.read_csv(csv_path, encoding='utf-8', sep=",")
+        vocabulary = build_tld_vocabulary(df['url'], base=vocabulary)
+    save_tld_vocabulary(vocabulary, vocabulary_path)
+    print(f"{len(vocabulary)} top level domains saved to {vocabulary_path}")
@@ -0,0 +1,83 @@
+"""Totals of paginated listings
+
+exact counts every matching document, capped stops counting at
+total_count_cap and reports the cap as a lower bound ("N+"), estimated
+scales the share of a random sample that matches by the collection size
+from its metadata, none skips the count. Counts are cached for
+count_cache_ttl seconds so paging through a listing counts it once.
+"""
+from typing import Optional, Tuple
+
+from bson import json_util
+
+from app.helpers.cache import TTLCache
+from app.helpers.metrics import register_stats
+from app.models.base import RootEnum
+from config.config import get_settings
+
+settings = get_settings()
+
+count_cache = TTLCache(
+    max_size=settings.count_cache_size,
+    ttl=settings.count_cache_ttl,
+)
+register_stats("url_classification_count_cache", count_cache.stats)
+
+# How the total compares to the real count
+RELATION_EQUAL = "eq"
+RELATION_AT_LEAST = "gte"
+RELATION_ESTIMATED = "approx"
+
+# Fewer sampled matches than this are too noisy to scale up
+MIN_SAMPLED_MATCHES = 10
+
+
+class TotalModeEnum(RootEnum):
+    EXACT = "exact"
+    CAPPED = "capped"
+    ESTIMATED = "estimated"
+    NONE = "none"
+
+
+async def count_capped(collection, query: dict, cap: int) -> Tuple[int, str]:
+    # Counting one past the cap tells a count of exactly cap from more
+    cap = max(1, cap)
+    count = await collection.count_documents(query, limit=cap + 1)
+    if count > cap:
+        return cap, RELATION_AT_LEAST
+    return count, RELATION_EQUAL
+
+
+async def count_estimated(collection, query: dict) -> Tuple[int, str]:
+    estimated = await collection.estimated_document_count()
+    if not query:
+        return estimated, RELATION_ESTIMATED
+    sample_size = max(1, settings.total_estimate_sample_size)
+    if estimated <= sample_size:
+        return await collection.count_documents(query), RELATION_EQUAL
+    result = await collection.aggregate([
+        {"$sample": {"size": sample_size}},
+        {"$match": query},
+        {"$count": "matches"},
+    ]).to_list(length=1)
+    matches = result[0]["matches"] if result else 0
+    if matches < MIN_SAMPLED_MATCHES:
+        # A narrow filter, its capped count is cheap
+        return await count_capped(collection, query, settings.total_count_cap)
+    return round(estimated * matches / sample_size), RELATION_ESTIMATED
+
+
+async def count_total(collection, query: dict, mode: TotalModeEnum) -> Tuple[Optional[int], Optional[str]]:
+    """Total of the documents matching query and how it relates to the real count"""
+    if mode == TotalModeEnum.NONE:
+        return None, None
+
+    async def compute() -> Tuple[int, str]:
+        if mode == TotalModeEnum.CAPPED:
+            return await count_capped(collection, query, settings.total_count_cap)
+        if mode == TotalModeEnum.ESTIMATED:
+            return await count_estimated(collection, query)
+        return await collection.count_documents(query), RELATION_EQUAL
+
+    key = (collection.name, mode.value, json_util.dumps(query, sort_keys=True))
+    return await count_cache.get_or_compute(key, compute)
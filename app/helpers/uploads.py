@@ -0,0 +1,137 @@
+import os
+import tempfile
+from typing import Optional, Tuple
+
+from fastapi import Request
+from multipart.exceptions import MultipartParseError
+from multipart.multipart import MultipartParser, parse_options_header
+
+from app.helpers.exceptions import BadRequestException
+
+# Boundaries and part headers around the file, a body over max_size plus
+# this is rejected from its Content-Length without reading it
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+# Documents the multipart body the upload routes read themselves
+UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {"file": {"type": "string", "format": "binary"}},
+                    "required": ["file"],
+                },
+            },
+        },
+    },
+}
+
+
+def _discard(spooled: tempfile._TemporaryFileWrapper):
+    spooled.close()
+    if os.path.exists(spooled.name):
+        os.unlink(spooled.name)
+
+
+class _FilePartWriter:
+    """Multipart parser callbacks writing the data of the field_name part to
+    spooled, flagging too_large once it grows past max_size"""
+
+    def __init__(self, spooled: tempfile._TemporaryFileWrapper, field_name: str, max_size: int):
+        self.spooled = spooled
+        self.field_name = field_name.encode("latin-1")
+        self.max_size = max_size
+        self.size = 0
+        self.too_large = False
+        self.found = False
+        self.file_name: Optional[str] = None
+        self._in_file = False
+        self._header_field = b""
+        self._header_value = b""
+        self._headers = {}
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+            "on_part_data": self.on_part_data,
+        }
+
+    def on_part_begin(self):
+        self._in_file = False
+        self._headers = {}
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        # Only the first part of that name is kept
+        if options.get(b"name") == self.field_name and not self.found:
+            self.found = self._in_file = True
+            file_name = options.get(b"filename")
+            self.file_name = file_name.decode("utf-8", "replace") if file_name is not None else None
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if not self._in_file or self.too_large:
+            return
+        self.size += end - start
+        if self.size > self.max_size:
+            self.too_large = True
+            return
+        self.spooled.write(data[start:end])
+
+
+async def spool_upload(
+    request: Request,
+    max_size: int,
+    delete: bool = True,
+    field_name: str = "file",
+) -> Tuple[Optional[tempfile._TemporaryFileWrapper], Optional[str]]:
+    """Streams the field_name file of a multipart request body to a temporary
+    file on disk as it arrives, with the file name the client gave. Returns
+    no file, before reading the body when its Content-Length already says
+    so, as soon as the file grows past max_size. With delete=False the file
+    outlives the returned handle and the caller removes it"""
+    content_length = request.headers.get("content-length")
+    if content_length is not None and content_length.isdigit() \
+            and int(content_length) > max_size + MULTIPART_OVERHEAD_BYTES:
+        return None, None
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise BadRequestException("Expected a multipart/form-data upload")
+
+    spooled = tempfile.NamedTemporaryFile(prefix="upload-", suffix=".csv", delete=delete)
+    writer = _FilePartWriter(spooled, field_name, max_size)
+    parser = MultipartParser(boundary, writer.callbacks())
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if writer.too_large:
+                # Stop reading, the rest of the body is never received
+                _discard(spooled)
+                return None, None
+        parser.finalize()
+        if not writer.found:
+            raise BadRequestException(f"Missing {field_name} field")
+        spooled.flush()
+    except MultipartParseError:
+        _discard(spooled)
+        raise BadRequestException("Malformed multipart body")
+    except BaseException:
+        _discard(spooled)
+        raise
+    return spooled, writer.file_name
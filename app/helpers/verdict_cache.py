@@ -0,0 +1,14 @@
+import hashlib
+
+
+def normalize_url(url: str) -> str:
+    # Only surrounding whitespace is dropped: every feature is case sensitive
+    # or counts characters, so any other rewrite could change the verdict.
+    # get_prediction scores the normalized url, so urls sharing a key always
+    # share the model input too
+    return url.strip()
+
+
+def url_fingerprint(url: str) -> str:
+    # Fixed size, so long urls stay under the index key limit
+    return hashlib.blake2b(normalize_url(url).encode("utf-8"), digest_size=16).hexdigest()
@@ -0,0 +1,98 @@
+"""Picks the verdict to reuse for a url from the ones History already holds
+
+Candidates are grouped by (fingerprint, approval, review, model version,
+detection, classifier). A verdict a reviewer approved wins whatever model
+made it, otherwise the latest verdict of the current model is reused unless
+a reviewer rejected that same verdict for the url. Only rows submitted for
+review and decided by an admin count as reviewed, the Approved status an
+admin's own predictions start with is not a review.
+"""
+from typing import Dict, Iterable, Tuple
+
+from app.models.history import ApprovalEnum
+
+REVIEWED = [ApprovalEnum.Approved.value, ApprovalEnum.Rejected.value]
+
+# Matches the rows a reviewer decided, see HistoryService.review_fields
+REVIEWED_QUERY = {"approved": {"$in": REVIEWED}, "need_review": True, "approved_by": {"$ne": None}}
+
+
+def lookup_pipeline(fingerprints: Iterable[str], model_version: str) -> list:
+    return [
+        {"$match": {
+            "url_fingerprint": {"$in": list(fingerprints)},
+            "$or": [
+                {"model_version": model_version},
+                REVIEWED_QUERY,
+            ],
+        }},
+        {"$group": {
+            "_id": {
+                "url_fingerprint": "$url_fingerprint",
+                "approved": "$approved",
+                "reviewed": {"$and": [
+                    {"$eq": ["$need_review", True]},
+                    {"$ne": [{"$ifNull": ["$approved_by", None]}, None]},
+                ]},
+                "model_version": "$model_version",
+                "detection": "$detection",
+                "classifier": "$classifier",
+            },
+            "last_at": {"$max": "$updated_at"},
+        }},
+    ]
+
+
+def resolve_prior_verdicts(
+    groups: Iterable[dict],
+    model_version: str,
+) -> Dict[str, Tuple[bool, str, str, bool]]:
+    """Maps each fingerprint with a reusable verdict to
+    (detection, classifier, model_version, reviewed)"""
+    approved = {}
+    rejected = set()
+    current = {}
+    for group in groups:
+        key = group["_id"]
+        fingerprint = key["url_fingerprint"]
+        verdict = (key["detection"], key["classifier"])
+        reviewed = key.get("reviewed", False)
+        if reviewed and key.get("approved") == ApprovalEnum.Approved.value:
+            if fingerprint not in approved or group["last_at"] > approved[fingerprint][0]:
+                approved[fingerprint] = (group["last_at"], verdict, key.get("model_version"))
+        elif reviewed and key.get("approved") == ApprovalEnum.Rejected.value:
+            rejected.add((fingerprint, verdict))
+        if key.get("model_version") == model_version and key.get("approved") != ApprovalEnum.Rejected.value:
+            current.setdefault(fingerprint, []).append((group["last_at"], verdict))
+
+    verdicts = {}
+    for fingerprint, (_, (detection, classifier), version) in approved.items():
+        verdicts[fingerprint] = (detection, classifier, version, True)
+    for fingerprint, candidates in current.items():
+        if fingerprint in verdicts:
+            continue
+        for _, verdict in sorted(candidates, key=lambda candidate: candidate[0], reverse=True):
+            if (fingerprint, verdict) not in rejected:
+                verdicts[fingerprint] = (*verdict, model_version, False)
+                break
+    return verdicts
+
+
+class VerdictLookupStats:
+    def __init__(self):
+        self.lookups = 0
+        self.hits = 0
+        self.reviewed_hits = 0
+
+    def record(self, lookups: int, hits: int, reviewed_hits: int):
+        self.lookups += lookups
+        self.hits += hits
+        self.reviewed_hits += reviewed_hits
+
+    def stats(self) -> dict:
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "reviewed_hits": self.reviewed_hits,
+            "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+        }
@@ -4,7 +4,8 @@ from fastapi.exceptions import RequestValidationError
 
 from app.helpers.exceptions import (
     BadRequestException, NotFoundException, 
-    PermissionDeniedException, ConflictException
+    PermissionDeniedException, ConflictException,
+    ServiceUnavailableException
 )
 
 from app.dto.common import BaseResponse
@@ -71,4 +72,13 @@ def add_exception_handlers(app: FastAPI):
     ):
         error_message = str(exc) or 'Conflict'
         _logger.warning(f'ConflictException {error_message}')
-        return JSONResponse(status_code=469, content={'error': error_message})
\ No newline at end of file
+        return JSONResponse(status_code=469, content={'error': error_message})
+
+    @app.exception_handler(ServiceUnavailableException)
+    async def service_unavailable_handler(
+        request: Request,
+        exc: ServiceUnavailableException
+    ):
+        error_message = str(exc) or 'Service Unavailable'
+        _logger.warning(f'ServiceUnavailableException {error_message}')
+        return JSONResponse(status_code=503, content={'error': error_message})
\ No newline at end of file
@@ -0,0 +1,53 @@
+import time
+
+from fastapi import FastAPI
+from starlette.routing import Match
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.helpers import metrics
+
+
+class MetricsMiddleware:
+    """Times every request and counts the ones in flight, labelled with the
+    route template so /history/{id} is one series"""
+
+    def __init__(self, app: ASGIApp, routes: list):
+        self.app = app
+        self.routes = routes
+
+    def route_name(self, scope: Scope) -> str:
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+        return "unmatched"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        route = self.route_name(scope)
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        in_flight = metrics.requests_in_flight.labels(method, route)
+        in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            metrics.request_seconds.labels(method, route, status).observe(time.perf_counter() - start)
+
+
+def add_metrics(app: FastAPI):
+    if not metrics.enabled:
+        return
+    # Routers are included at startup, the list is read per request
+    app.add_middleware(MetricsMiddleware, routes=app.router.routes)
@@ -1,7 +1,9 @@
-from pymongo import ASCENDING, IndexModel
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from datetime import datetime
 from typing import Optional
 
+from pydantic import ConfigDict
+
 from app.models.base import RootModel, RootEnum
 from app.models.user import UserRoleEnum
 
@@ -17,14 +19,61 @@ class ApprovalEnum(RootEnum):
     Pending = "Pending"
 
 class History(RootModel):
+    model_config = ConfigDict(protected_namespaces=())
+
     class Settings:
         name = "history"
+        # One index per query shape of HistoryService, ReportService and
+        # JobService, equality fields first then the range or sort field.
+        # Check them with: python -m app.database.commands check-indexes
         indexes = [
+            # User history and user reports
             IndexModel(
                 [
                     ("submitter_id", ASCENDING),
+                    ("created_at", ASCENDING),
+                    ("_id", ASCENDING),
+                ]
+            ),
+            # Approved, pending and rejected listings, admin reports
+            IndexModel(
+                [
+                    ("approved", ASCENDING),
+                    ("created_at", ASCENDING),
+                    ("_id", ASCENDING),
+                ]
+            ),
+            # All history
+            IndexModel(
+                [
+                    ("created_at", ASCENDING),
+                    ("_id", ASCENDING),
+                ]
+            ),
+            # Recent approvals
+            IndexModel(
+                [
+                    ("need_review", ASCENDING),
+                    ("approved", ASCENDING),
+                    ("approved_at", DESCENDING),
+                    ("_id", DESCENDING),
+                ]
+            ),
+            # Job results, only predictions made by a job have a job_id
+            # string (any job_id equality match implies $gt "", null does not)
+            IndexModel(
+                [
+                    ("job_id", ASCENDING),
+                    ("_id", ASCENDING),
+                ],
+                partialFilterExpression={"job_id": {"$gt": ""}},
+            ),
+            IndexModel(
+                [
+                    ("url_fingerprint", ASCENDING),
+                    ("model_version", ASCENDING),
                 ]
-            )
+            ),
         ]
     submitter_id: str #ID of the submitter
     submitter_role: UserRoleEnum
@@ -35,4 +84,7 @@ class History(RootModel):
     need_review: bool
     approved: Optional[ApprovalEnum]
     approved_at: Optional[datetime]
-    approved_by: Optional[str] #ID of the approver
\ No newline at end of file
+    approved_by: Optional[str] #ID of the approver
+    model_version: Optional[str] = None #Version of the ensemble that made the prediction
+    job_id: Optional[str] = None #ID of the batch job that made the prediction
+    url_fingerprint: Optional[str] = None #Hash of the normalized url, see url_fingerprint
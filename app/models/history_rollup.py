@@ -0,0 +1,43 @@
+from pymongo import ASCENDING, IndexModel
+from datetime import datetime
+from typing import Optional
+
+from app.models.base import RootModel
+from app.models.history import ClassifierEnum, ApprovalEnum
+
+class HistoryRollup(RootModel):
+    """History counters per day and submitter, see RollupService"""
+    class Settings:
+        name = "history_rollup"
+        indexes = [
+            IndexModel(
+                [
+                    ("day", ASCENDING),
+                    ("submitter_id", ASCENDING),
+                    ("detection", ASCENDING),
+                    ("classifier", ASCENDING),
+                    ("approved", ASCENDING),
+                ],
+                unique=True,
+            ),
+            # User reports
+            IndexModel(
+                [
+                    ("submitter_id", ASCENDING),
+                    ("day", ASCENDING),
+                ]
+            ),
+            # Admin reports
+            IndexModel(
+                [
+                    ("approved", ASCENDING),
+                    ("day", ASCENDING),
+                ]
+            ),
+        ]
+    day: datetime #Start of the day the predictions were created
+    submitter_id: str #ID of the submitter
+    detection: bool
+    classifier: ClassifierEnum
+    approved: Optional[ApprovalEnum]
+    total: int
@@ -0,0 +1,34 @@
+from pymongo import ASCENDING, IndexModel
+from datetime import datetime
+from typing import Optional
+
+from app.models.base import RootModel, RootEnum
+from app.models.user import UserRoleEnum
+
+class JobStatusEnum(RootEnum):
+    Queued = "Queued"
+    Running = "Running"
+    Completed = "Completed"
+    Failed = "Failed"
+
+class Job(RootModel):
+    class Settings:
+        name = "job"
+        indexes = [
+            IndexModel(
+                [
+                    ("submitter_id", ASCENDING),
+                ]
+            )
+        ]
+    submitter_id: str #ID of the submitter
+    submitter_role: UserRoleEnum
+    file_name: Optional[str]
+    status: JobStatusEnum
+    total_bytes: int
+    bytes_done: int = 0
+    rows_done: int = 0
+    urls_scored: int = 0 #Rows left after deduplication
+    error: Optional[str] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -1,9 +1,13 @@
-from .health import ping
+from .health import ping, metrics
+from app.helpers.metrics import enabled as metrics_enabled
 import app.routers.user as user
 import app.routers.account as account
 import app.routers.history as history
 import app.routers.prediction as prediction
 import app.routers.report as report
+import app.routers.model as model
+import app.routers.job as job
+import app.routers.database as database
 
 def add_route(route, routers, tags):
     prefix = '/api'
@@ -18,8 +22,15 @@ routers = []
 routers.append({
     'router': ping.router
 })
+if metrics_enabled:
+    routers.append({
+        'router': metrics.router
+    })
 add_route(user.router, routers, user.router.tags)
 add_route(account.router, routers, account.router.tags)
 add_route(history.router, routers, history.router.tags)
 add_route(prediction.router, routers, prediction.router.tags)
-add_route(report.router, routers, report.router.tags)
\ No newline at end of file
+add_route(report.router, routers, report.router.tags)
+add_route(model.router, routers, model.router.tags)
+add_route(job.router, routers, job.router.tags)
+add_route(database.router, routers, database.router.tags)
\ No newline at end of file
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends
+
+from app.dto.common import BaseResponseData
+from app.models.user import UserRoleEnum
+from app.helpers.metrics import get_pool_stats
+from app.helpers.auth_helpers import get_current_user
+
+router = APIRouter(tags=['Database'], prefix="/database")
+
+@router.get(
+    "/pool_stats",
+    response_model=BaseResponseData,
+)
+async def pool_stats(
+    current_user: str = Depends(get_current_user),
+):
+    user_id, role = current_user
+    if role != UserRoleEnum.ADMIN.value:
+        return BaseResponseData(
+            error_code=403,
+            message="Permission denied"
+        )
+    return BaseResponseData(
+        message="Success",
+        data=get_pool_stats(),
+    )
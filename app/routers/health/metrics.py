@@ -0,0 +1,15 @@
+from fastapi import APIRouter, Response
+
+from app.helpers.metrics import render_metrics
+
+
+router = APIRouter(tags=['Metrics'])
+
+
+@router.get(
+    '/metrics',
+    include_in_schema=False,
+)
+async def get_metrics():
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
@@ -3,10 +3,11 @@ from typing import Optional
 from fastapi import APIRouter, Depends, Query
 
 from app.dto.common import BasePaginationResponseData, BaseResponse
-from app.dto.report_dto import HistoryResponse
+from app.dto.report_dto import HistoryResponse, BulkHistoryRequest, BulkHistoryResponse
 from app.models.user import UserRoleEnum
 from app.models.history import ApprovalEnum
 from app.services.history_services import HistoryService
+from app.helpers.totals import TotalModeEnum
 from app.helpers.auth_helpers import get_current_user
 
 router = APIRouter(tags=['History'], prefix="/history")
@@ -20,25 +21,31 @@ async def user_history(
     max_date: datetime = Query(...),
     page: int = Query(1),
     size: int = Query(10),
+    cursor: Optional[str] = Query(None),
+    total_mode: TotalModeEnum = Query(TotalModeEnum.EXACT),
     classifier: Optional[str] = Query(None),
     approved_status: Optional[str] = Query(None),
     current_user: str = Depends(get_current_user),
 ):
     user_id, role = current_user
-    history_data, total = await HistoryService.get_history_data(
+    history_data, total, total_relation, next_cursor = await HistoryService.get_history_data(
         min_date=min_date, 
         max_date=max_date, 
         page=page, 
         size=size, 
         classifier=classifier,
         approved_status=approved_status,
-        user_id=user_id
+        user_id=user_id,
+        cursor=cursor,
+        total_mode=total_mode,
     )
     return BasePaginationResponseData(
         items=history_data,
         page=page,
         size=size,
-        total=total
+        total=total,
+        total_relation=total_relation,
+        next_cursor=next_cursor,
     )
 
 @router.get(
@@ -50,23 +57,29 @@ async def approved_global_history(
     max_date: datetime = Query(...),
     page: int = Query(1),
     size: int = Query(10),
+    cursor: Optional[str] = Query(None),
+    total_mode: TotalModeEnum = Query(TotalModeEnum.EXACT),
     classifier: Optional[str] = Query(None),
     current_user: str = Depends(get_current_user),
 ):
-    history_data, total = await HistoryService.get_history_data(
+    history_data, total, total_relation, next_cursor = await HistoryService.get_history_data(
         min_date=min_date, 
         max_date=max_date, 
         page=page, 
         size=size, 
         classifier=classifier,
         approved_status=ApprovalEnum.Approved.value,
-        user_id=None
+        user_id=None,
+        cursor=cursor,
+        total_mode=total_mode,
     )
     return BasePaginationResponseData(
         items=history_data,
         page=page,
         size=size,
-        total=total
+        total=total,
+        total_relation=total_relation,
+        next_cursor=next_cursor,
     )
 
 @router.get(
@@ -78,6 +91,8 @@ async def all_history(
     max_date: datetime = Query(...),
     page: int = Query(1),
     size: int = Query(10),
+    cursor: Optional[str] = Query(None),
+    total_mode: TotalModeEnum = Query(TotalModeEnum.EXACT),
     classifier: Optional[str] = Query(None),
     approved_status: Optional[str] = Query(None),
     current_user: str = Depends(get_current_user),
@@ -88,20 +103,24 @@ async def all_history(
             error_code=403,
             message="Permission denied"
         )
-    history_data, total = await HistoryService.get_history_data(
+    history_data, total, total_relation, next_cursor = await HistoryService.get_history_data(
         min_date=min_date,
         max_date=max_date,
         page=page,
         size=size,
         classifier=classifier,
         approved_status=approved_status,
-        user_id=None
+        user_id=None,
+        cursor=cursor,
+        total_mode=total_mode,
     )
     return BasePaginationResponseData(
         items=history_data,
         page=page,
         size=size,
-        total=total
+        total=total,
+        total_relation=total_relation,
+        next_cursor=next_cursor,
     )
 
 @router.get(
@@ -113,6 +132,8 @@ async def pending_approvals_history(
     max_date: datetime = Query(...),
     page: int = Query(1),
     size: int = Query(10),
+    cursor: Optional[str] = Query(None),
+    total_mode: TotalModeEnum = Query(TotalModeEnum.EXACT),
     classifier: Optional[str] = Query(None),
     current_user: str = Depends(get_current_user),
 ):
@@ -122,7 +143,7 @@ async def pending_approvals_history(
             error_code=403,
             message="Permission denied"
         )
-    history_data, total = await HistoryService.get_history_data(
+    history_data, total, total_relation, next_cursor = await HistoryService.get_history_data(
         min_date=min_date,
         max_date=max_date,
         page=page,
@@ -130,13 +151,17 @@ async def pending_approvals_history(
         classifier=classifier,
         approved_status=ApprovalEnum.Pending.value,
         need_review=True,
-        user_id=None
+        user_id=None,
+        cursor=cursor,
+        total_mode=total_mode,
     )
     return BasePaginationResponseData(
         items=history_data,
         page=page,
         size=size,
-        total=total
+        total=total,
+        total_relation=total_relation,
+        next_cursor=next_cursor,
     )
 
 @router.get(
@@ -146,16 +171,22 @@ async def pending_approvals_history(
 async def recent_approvals_history(
     page: int = Query(1),
     size: int = Query(10),
+    cursor: Optional[str] = Query(None),
+    total_mode: TotalModeEnum = Query(TotalModeEnum.EXACT),
 ):
-    history_data, total = await HistoryService.get_recent_approval_history(
+    history_data, total, total_relation, next_cursor = await HistoryService.get_recent_approval_history(
         page=page,
-        size=size
+        size=size,
+        cursor=cursor,
+        total_mode=total_mode,
     )
     return BasePaginationResponseData(
         items=history_data,
         page=page,
         size=size,
-        total=total
+        total=total,
+        total_relation=total_relation,
+        next_cursor=next_cursor,
     )
 
 @router.get(
@@ -247,4 +278,67 @@ async def delete(
     history_data = await HistoryService.delete_history(history_id)
     return BaseResponse(
         message="Success"
-    )
\ No newline at end of file
+    )
+
+@router.post(
+    "/bulk/submit_for_approval",
+    response_model=BulkHistoryResponse,
+)
+async def bulk_submit_for_approval(
+    request: BulkHistoryRequest,
+    current_user: str = Depends(get_current_user),
+):
+    user_id, role = current_user
+    bulk_data = await HistoryService.bulk_submit_history(
+        user_id=user_id,
+        ids=request.ids,
+        history_filter=request.filter,
+    )
+    return BulkHistoryResponse(
+        message="Success",
+        data=bulk_data
+    )
+
+@router.post(
+    "/bulk/approve",
+    response_model=BulkHistoryResponse,
+)
+async def bulk_approve(
+    request: BulkHistoryRequest,
+    current_user: str = Depends(get_current_user),
+):
+    user_id, role = current_user
+    if role != UserRoleEnum.ADMIN.value:
+        return BulkHistoryResponse(
+            error_code=403,
+            message="Permission denied"
+        )
+    bulk_data = await HistoryService.bulk_update_history(
+        ApprovalEnum.Approved, user_id, ids=request.ids, history_filter=request.filter
+    )
+    return BulkHistoryResponse(
+        message="Success",
+        data=bulk_data
+    )
+
+@router.post(
+    "/bulk/reject",
+    response_model=BulkHistoryResponse,
+)
+async def bulk_reject(
+    request: BulkHistoryRequest,
+    current_user: str = Depends(get_current_user),
+):
+    user_id, role = current_user
+    if role != UserRoleEnum.ADMIN.value:
+        return BulkHistoryResponse(
+            error_code=403,
+            message="Permission denied"
+        )
+    bulk_data = await HistoryService.bulk_update_history(
+        ApprovalEnum.Rejected, user_id, ids=request.ids, history_filter=request.filter
+    )
+    return BulkHistoryResponse(
+        message="Success",
+        data=bulk_data
+    )
@@ -0,0 +1,69 @@
+from fastapi import APIRouter, Depends, Query, Request
+
+from app.dto.common import BasePaginationResponseData
+from app.dto.job_dto import JobResponse
+from app.services.job_services import JobService
+from app.helpers.auth_helpers import get_current_user
+from app.helpers.uploads import spool_upload, UPLOAD_OPENAPI
+from config.config import get_settings
+
+settings = get_settings()
+
+router = APIRouter(tags=['Job'], prefix="/jobs")
+
+@router.post(
+    "/file_upload",
+    response_model=JobResponse,
+    openapi_extra=UPLOAD_OPENAPI,
+)
+async def file_upload(
+    request: Request,
+    current_user: str = Depends(get_current_user),
+):
+    spooled_file, file_name = await spool_upload(request, settings.job_max_bytes, delete=False)
+    if spooled_file is None:
+        return JobResponse(
+            message=f"File size exceeds {settings.job_max_bytes // 1_000_000}MB limit",
+            error_code=400
+        )
+    spooled_file.close()
+    user_id, role = current_user
+    job_data = await JobService.create_job(spooled_file.name, file_name, user_id, role)
+    return JobResponse(
+        message="Job queued",
+        data=job_data
+    )
+
+@router.get(
+    "/{job_id}",
+    response_model=JobResponse,
+)
+async def get_job(
+    job_id: str,
+    current_user: str = Depends(get_current_user),
+):
+    user_id, role = current_user
+    job_data = await JobService.get_job_status(job_id, user_id, role)
+    return JobResponse(
+        message="Success",
+        data=job_data
+    )
+
+@router.get(
+    "/{job_id}/results",
+    response_model=BasePaginationResponseData,
+)
+async def get_job_results(
+    job_id: str,
+    page: int = Query(1),
+    size: int = Query(100),
+    current_user: str = Depends(get_current_user),
+):
+    user_id, role = current_user
+    history_data, total = await JobService.get_job_results(job_id, user_id, role, page, size)
+    return BasePaginationResponseData(
+        items=history_data,
+        page=page,
+        size=size,
+        total=total
+    )
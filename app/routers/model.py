@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Depends
+
+from app.dto.model_dto import ModelRegistryResponse
+from app.models.user import UserRoleEnum
+from app.services.model_services import ModelService
+from app.helpers.auth_helpers import get_current_user
+
+router = APIRouter(tags=['Model'], prefix="/models")
+
+@router.get(
+    "",
+    response_model=ModelRegistryResponse,
+)
+async def list_models(
+    current_user: str = Depends(get_current_user),
+):
+    user_id, role = current_user
+    if role != UserRoleEnum.ADMIN.value:
+        return ModelRegistryResponse(
+            error_code=403,
+            message="Permission denied",
+            data=None
+        )
+    return ModelRegistryResponse(
+        message="Success",
+        data=ModelService.get_registry_data()
+    )
+
+@router.put(
+    "/{version}/activate",
+    response_model=ModelRegistryResponse,
+)
+async def activate(
+    version: str,
+    current_user: str = Depends(get_current_user),
+):
+    user_id, role = current_user
+    if role != UserRoleEnum.ADMIN.value:
+        return ModelRegistryResponse(
+            error_code=403,
+            message="Permission denied",
+            data=None
+        )
+    registry_data = await ModelService.activate(version)
+    return ModelRegistryResponse(
+        message="Success",
+        data=registry_data
+    )
@@ -1,9 +1,14 @@
-from fastapi import APIRouter, Depends, Query, UploadFile, File
+from fastapi import APIRouter, Depends, Query, Request
 
-from app.dto.common import BasePaginationResponseData
-from app.dto.report_dto import HistoryResponseWithoutId, SingleURLRequest
+from app.dto.common import BaseResponseData
+from app.dto.report_dto import HistoryResponseWithoutId, HistoryUploadResponse, SingleURLRequest
+from app.models.user import UserRoleEnum
 from app.services.prediction_services import PredictionService
 from app.helpers.auth_helpers import get_current_user
+from app.helpers.uploads import spool_upload, UPLOAD_OPENAPI
+from config.config import get_settings
+
+settings = get_settings()
 
 router = APIRouter(tags=['Prediction'], prefix="/prediction")
 
@@ -24,24 +29,121 @@ async def single_url(
 
 @router.post(
     "/file_upload",
-    response_model=BasePaginationResponseData,
+    response_model=HistoryUploadResponse,
+    openapi_extra=UPLOAD_OPENAPI,
 )
 async def file_upload(
-    file: UploadFile = File(...),
+    request: Request,
     current_user: str = Depends(get_current_user),
 ):
-    file_size = await file.read()
-    await file.close()
-    if len(file_size) > 10_000_000: # 10MB limit
-        return BasePaginationResponseData(
-            message="File size exceeds 10MB limit",
+    spooled_file, file_name = await spool_upload(request, settings.upload_max_bytes)
+    if spooled_file is None:
+        return HistoryUploadResponse(
+            message=f"File size exceeds {settings.upload_max_bytes // 1_000_000}MB limit",
             error_code=400
         )
     user_id, role = current_user
-    prediction_data = await PredictionService.get_prediction(file_size, user_id, role)
-    return BasePaginationResponseData(
+    with spooled_file:
+        prediction_data, dedupe_stats = await PredictionService.get_prediction(spooled_file.name, user_id, role)
+    return HistoryUploadResponse(
         items=prediction_data,
         total=len(prediction_data),
         page=1,
         size=len(prediction_data),
-    )
\ No newline at end of file
+        distinct_urls=dedupe_stats.scored,
+        dedupe_ratio=dedupe_stats.ratio,
+    )
+
+@router.get(
+    "/cache_stats",
+    response_model=BaseResponseData,
+)
+async def cache_stats(
+    current_user: str = Depends(get_current_user),
+):
+    user_id, role = current_user
+    if role != UserRoleEnum.ADMIN.value:
+        return BaseResponseData(
+            error_code=403,
+            message="Permission denied"
+        )
+    return BaseResponseData(
+        message="Success",
+        data=PredictionService.get_cache_stats(),
+    )
+
+
+@router.get(
+    "/batch_stats",
+    response_model=BaseResponseData,
+)
+async def batch_stats(
+    current_user: str = Depends(get_current_user),
+):
+    user_id, role = current_user
+    if role != UserRoleEnum.ADMIN.value:
+        return BaseResponseData(
+            error_code=403,
+            message="Permission denied"
+        )
+    return BaseResponseData(
+        message="Success",
+        data=PredictionService.get_batch_stats(),
+    )
+
+
+@router.get(
+    "/executor_stats",
+    response_model=BaseResponseData,
+)
+async def executor_stats(
+    current_user: str = Depends(get_current_user),
+):
+    user_id, role = current_user
+    if role != UserRoleEnum.ADMIN.value:
+        return BaseResponseData(
+            error_code=403,
+            message="Permission denied"
+        )
+    return BaseResponseData(
+        message="Success",
+        data=PredictionService.get_executor_stats(),
+    )
+
+
+@router.get(
+    "/dedupe_stats",
+    response_model=BaseResponseData,
+)
+async def dedupe_stats(
+    current_user: str = Depends(get_current_user),
+):
+    user_id, role = current_user
+    if role != UserRoleEnum.ADMIN.value:
+        return BaseResponseData(
+            error_code=403,
+            message="Permission denied"
+        )
+    return BaseResponseData(
+        message="Success",
+        data=PredictionService.get_dedupe_stats(),
+    )
+
+
+@router.get(
+    "/verdict_lookup_stats",
+    response_model=BaseResponseData,
+)
+async def verdict_lookup_stats(
+    current_user: str = Depends(get_current_user),
+):
+    user_id, role = current_user
+    if role != UserRoleEnum.ADMIN.value:
+        return BaseResponseData(
+            error_code=403,
+            message="Permission denied"
+        )
+    return BaseResponseData(
+        message="Success",
+        data=PredictionService.get_verdict_lookup_stats(),
+    )
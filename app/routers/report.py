@@ -1,6 +1,7 @@
 from datetime import datetime
 from fastapi import APIRouter, Depends, Query
 
+from app.dto.common import BaseResponseData
 from app.dto.report_dto import ReportResponse
 from app.models.user import UserRoleEnum
 from app.services.report_services import ReportService
@@ -43,4 +44,22 @@ async def admin_report(
     report = await ReportService.get_report_data(min_date, max_date, None)
     return ReportResponse(
         data=report
-    )
\ No newline at end of file
+    )
+
+@router.get(
+    "/cache_stats",
+    response_model=BaseResponseData,
+)
+async def cache_stats(
+    current_user: str = Depends(get_current_user),
+):
+    user_id, role = current_user
+    if role != UserRoleEnum.ADMIN.value:
+        return BaseResponseData(
+            error_code=403,
+            message="Permission denied"
+        )
+    return BaseResponseData(
+        message="Success",
+        data=ReportService.get_cache_stats(),
+    )
@@ -5,6 +5,7 @@ from app.dto.auth_dto import SignUpRequest, UserResponse, UserProfileRequest
 from app.models.user import UserRoleEnum
 from app.services.account_services import AccountService
 from app.helpers.auth_helpers import get_current_user
+from app.helpers.totals import TotalModeEnum
 
 router = APIRouter(tags=['User'], prefix="/user_management")
 
@@ -16,6 +17,7 @@ async def get_list_users(
     user: str = Depends(get_current_user),
     page: int = Query(1),
     size: int = Query(10),
+    total_mode: TotalModeEnum = Query(TotalModeEnum.EXACT),
 ):
     user_id, role = user
     if role != UserRoleEnum.ADMIN.value:
@@ -23,11 +25,12 @@ async def get_list_users(
             message='Permission Denied',
             error_code=403
         )
-    users, total = await AccountService.get_list_users(page, size)
+    users, total, total_relation = await AccountService.get_list_users(page, size, total_mode)
     return BasePaginationResponseData(
         message='Succeed',
         items=users,
         total=total,
+        total_relation=total_relation,
         page=page,
         size=size
     )
@@ -1,7 +1,7 @@
 import logging
 import hashlib
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 from beanie import PydanticObjectId
 from pymongo.errors import DuplicateKeyError
 
@@ -9,6 +9,7 @@ from app.models.user import User, UserRoleEnum
 from app.dto.auth_dto import UserResponseData
 from app.helpers.exceptions import NotFoundException, BadRequestException, PermissionDeniedException
 from app.helpers.auth_helpers import login_token
+from app.helpers.totals import TotalModeEnum, count_total
 
 _logger = logging.getLogger(__name__)
 
@@ -61,15 +62,19 @@ class AccountService:
         return new_user
     
     @staticmethod
-    async def get_list_users(page: int, size: int) -> tuple[List[UserResponseData], int]:
+    async def get_list_users(
+        page: int,
+        size: int,
+        total_mode: TotalModeEnum = TotalModeEnum.EXACT,
+    ) -> tuple[List[UserResponseData], Optional[int], Optional[str]]:
         if page < 1 or size < 1:
             raise BadRequestException("Page and size must be greater than 0")
         skip = (page - 1) * size
-        count = await User.count()
         users = await User.find_all(skip=skip, limit=size).project(UserResponseData).to_list()
         if not users:
             raise NotFoundException("No users found")
-        return users, count
+        count, relation = await count_total(User.get_motor_collection(), {}, total_mode)
+        return users, count, relation
     
     @staticmethod
     async def update_user(user_id: str, user_name: str, email: str) -> UserResponseData:
@@ -1,15 +1,48 @@
+import asyncio
 import logging
+from collections import defaultdict
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from beanie import PydanticObjectId
+from beanie.odm.queries.find import FindMany
+from bson import ObjectId
+from pymongo import ReturnDocument, UpdateMany
 
+from app.database.factory import analytics_collection
 from app.models.history import History, ApprovalEnum, ClassifierEnum
-from app.dto.report_dto import HistoryResponseData
-from app.helpers.exceptions import NotFoundException
+from app.dto.report_dto import (
+    HistoryResponseData, BulkHistoryFilter, BulkHistoryResponseData, BulkHistoryResultData,
+)
+from app.helpers.exceptions import NotFoundException, BadRequestException, ConflictException
+from app.services.rollup_services import RollupService
+from app.services.report_services import ReportService
+from app.helpers.pagination import SortKeys, decode_cursor, keyset_filter, next_cursor
+from app.helpers.totals import TotalModeEnum, count_total
+from config.config import get_settings
 
 _logger = logging.getLogger(__name__)
 
+settings = get_settings()
+
+# Listing orders, matching the History indexes, _id breaks ties
+HISTORY_SORT_KEYS = [("created_at", 1), ("_id", 1)]
+RECENT_APPROVAL_SORT_KEYS = [("approved_at", -1), ("_id", -1)]
+
+# Approval states each transition may start from, checked in the update filter
+SUBMIT_FROM_STATES = [None, ApprovalEnum.Rejected.value]
+REVIEW_FROM_STATES = [ApprovalEnum.Pending.value]
+
+# Fields a state change needs to move its rollup and report counts
+TRANSITION_PROJECTION = {"submitter_id": 1, "created_at": 1, "detection": 1, "classifier": 1, "approved": 1}
+LISTING_PROJECTION = {field.alias or name: 1 for name, field in HistoryResponseData.model_fields.items()}
+RESPONSE_PROJECTION = {**TRANSITION_PROJECTION, **LISTING_PROJECTION}
+
+BULK_UPDATED = "updated"
+BULK_NOT_FOUND = "not_found"
+BULK_INVALID_STATE = "invalid_state"
+BULK_CONFLICT = "conflict"
+
 class HistoryService:
     @staticmethod
     async def get_by_id(history_id: str) -> HistoryResponseData:
@@ -17,16 +50,14 @@ class HistoryService:
         return await query.project(HistoryResponseData)
 
     @staticmethod
-    async def get_history_data(
-        min_date: datetime, 
-        max_date: datetime, 
-        page: int, 
-        size: int, 
-        classifier: Optional[str] = None, 
-        approved_status: Optional[str] = None, 
+    def build_history_query(
+        min_date: datetime,
+        max_date: datetime,
+        classifier: Optional[str] = None,
+        approved_status: Optional[str] = None,
         need_review: Optional[bool] = None,
         user_id: Optional[str] = None
-    ) -> tuple[List[HistoryResponseData], int]:
+    ) -> FindMany[History]:
         if user_id is not None:
             query = History.find(
                 History.submitter_id == user_id,
@@ -44,53 +75,239 @@ class HistoryService:
             query = query.find(History.approved == ApprovalEnum[approved_status])
         if need_review is not None:
             query = query.find(History.need_review == True)
+        return query.sort(*HISTORY_SORT_KEYS)
+
+    @staticmethod
+    async def paginate(
+        query: FindMany[History],
+        sort_keys: SortKeys,
+        page: int,
+        size: int,
+        cursor: Optional[str] = None,
+        total_mode: TotalModeEnum = TotalModeEnum.EXACT,
+    ) -> tuple[List[HistoryResponseData], Optional[int], Optional[str], Optional[str]]:
+        """Page of the sorted query from page/size, or from the cursor of the
+        previous page when given, with its total in total_mode, the relation
+        of that total to the real count and the cursor of the next page"""
+        collection = analytics_collection(History)
+        total = count_total(collection, query.get_filter_query(), total_mode)
+        skip = 0
+        if cursor is not None:
+            query = query.find(keyset_filter(sort_keys, decode_cursor(cursor, sort_keys)))
+        else:
+            skip = (page - 1) * size
+        page_documents = collection.find(query.get_filter_query(), LISTING_PROJECTION) \
+            .sort(sort_keys).skip(skip).limit(size).to_list(None)
+        (count, relation), documents = await asyncio.gather(total, page_documents)
+        history_data = [HistoryResponseData(**document) for document in documents]
+        return history_data, count, relation, next_cursor(history_data, size, sort_keys)
 
-        skip = (page - 1) * size
-        count = await query.count()
-        history_data = await query.skip(skip).limit(size).project(HistoryResponseData).to_list()
-        return history_data, count
+    @staticmethod
+    async def get_history_data(
+        min_date: datetime, 
+        max_date: datetime, 
+        page: int, 
+        size: int, 
+        classifier: Optional[str] = None, 
+        approved_status: Optional[str] = None, 
+        need_review: Optional[bool] = None,
+        user_id: Optional[str] = None,
+        cursor: Optional[str] = None,
+        total_mode: TotalModeEnum = TotalModeEnum.EXACT,
+    ) -> tuple[List[HistoryResponseData], Optional[int], Optional[str], Optional[str]]:
+        query = HistoryService.build_history_query(
+            min_date, max_date, classifier, approved_status, need_review, user_id
+        )
+        return await HistoryService.paginate(query, HISTORY_SORT_KEYS, page, size, cursor, total_mode)
     
     @staticmethod
-    async def get_recent_approval_history(page: int, size: int) -> tuple[List[HistoryResponseData], int]:
-        query = History.find(
+    def build_recent_approval_query() -> FindMany[History]:
+        return History.find(
             History.need_review == True,
             History.approved == ApprovalEnum.Approved
-        )
-        skip = (page - 1) * size
-        count = await query.count()
-        history_data = await query.sort(-History.approved_at).skip(skip).limit(size).project(HistoryResponseData).to_list()
-        return history_data, count
+        ).sort(*RECENT_APPROVAL_SORT_KEYS)
+
+    @staticmethod
+    async def get_recent_approval_history(
+        page: int,
+        size: int,
+        cursor: Optional[str] = None,
+        total_mode: TotalModeEnum = TotalModeEnum.EXACT,
+    ) -> tuple[List[HistoryResponseData], Optional[int], Optional[str], Optional[str]]:
+        query = HistoryService.build_recent_approval_query()
+        return await HistoryService.paginate(query, RECENT_APPROVAL_SORT_KEYS, page, size, cursor, total_mode)
     
     @staticmethod
     async def user_submit_history(user_id: str, history_id: str) -> HistoryResponseData:
-        history = await History.find_one(
-            History.submitter_id == user_id, 
-            History.id == PydanticObjectId(history_id)
+        return await HistoryService.transition(
+            {"_id": PydanticObjectId(history_id), "submitter_id": user_id},
+            SUBMIT_FROM_STATES,
+            HistoryService.submit_fields(HistoryService.transition_time()),
+            "Only new or rejected history can be submitted",
         )
-        if history is None:
-            raise NotFoundException("History not found")
-        history.need_review = True
-        history.approved = ApprovalEnum.Pending
-        history.updated_at = datetime.now()
-        await history.save()
-        return HistoryResponseData(**history.model_dump(), _id=history.id)
     
     @staticmethod
     async def update_history(history_id: str, approved: ApprovalEnum, admin_id: str) -> HistoryResponseData:
-        history = await History.find_one(History.id == PydanticObjectId(history_id))
-        if history is None:
+        return await HistoryService.transition(
+            {"_id": PydanticObjectId(history_id)},
+            REVIEW_FROM_STATES,
+            HistoryService.review_fields(approved, admin_id, HistoryService.transition_time()),
+            "Only pending history can be reviewed",
+        )
+
+    @staticmethod
+    async def transition(
+        match: dict,
+        from_states: List[Optional[str]],
+        fields: dict,
+        invalid_state_message: str,
+    ) -> HistoryResponseData:
+        """Sets fields on the matched item in one find_one_and_update guarded
+        by its approval state, the old state it returns moves the rollups"""
+        collection = History.get_motor_collection()
+        before = await collection.find_one_and_update(
+            {**match, "approved": {"$in": from_states}},
+            {"$set": fields},
+            projection=RESPONSE_PROJECTION,
+            return_document=ReturnDocument.BEFORE,
+        )
+        if before is None:
+            # Only failed updates pay for telling a missing item from a guarded one
+            if await collection.count_documents(match, limit=1):
+                raise ConflictException(invalid_state_message)
             raise NotFoundException("History not found")
-        history.approved = approved
-        history.updated_at = datetime.now()
-        history.approved_at = datetime.now()
-        history.approved_by = admin_id
-        await history.save()
-        return HistoryResponseData(**history.model_dump(), _id=history.id)
+        await RollupService.record_approval_changes([before], fields["approved"])
+        ReportService.invalidate_approval_changes([before], fields["approved"])
+        return HistoryResponseData(**{**before, **fields})
     
     @staticmethod
     async def delete_history(history_id: str) -> bool:
-        history = await History.find_one(History.id == PydanticObjectId(history_id))
-        if history is None:
+        # The deleted document, so the counts move from the state actually removed
+        deleted = await History.get_motor_collection().find_one_and_delete(
+            {"_id": PydanticObjectId(history_id)},
+            projection=TRANSITION_PROJECTION,
+        )
+        if deleted is None:
             raise NotFoundException("History not found")
-        await history.delete()
-        return True
\ No newline at end of file
+        await RollupService.record_deleted([deleted])
+        ReportService.invalidate_rows(
+            [(deleted["submitter_id"], deleted["created_at"], deleted.get("approved"))]
+        )
+        return True
+
+    @staticmethod
+    def submit_fields(now: datetime) -> dict:
+        return {"need_review": True, "approved": ApprovalEnum.Pending.value, "updated_at": now}
+
+    @staticmethod
+    def review_fields(approved: ApprovalEnum, admin_id: str, now: datetime) -> dict:
+        return {"approved": approved.value, "updated_at": now, "approved_at": now, "approved_by": admin_id}
+
+    @staticmethod
+    async def bulk_submit_history(
+        user_id: str,
+        ids: Optional[List[str]] = None,
+        history_filter: Optional[BulkHistoryFilter] = None,
+    ) -> BulkHistoryResponseData:
+        if history_filter is not None:
+            history_filter = history_filter.model_copy(update={"submitter_id": user_id})
+        return await HistoryService.bulk_transition(
+            HistoryService.submit_fields(HistoryService.transition_time()),
+            SUBMIT_FROM_STATES, {"submitter_id": user_id}, ids, history_filter,
+        )
+
+    @staticmethod
+    async def bulk_update_history(
+        approved: ApprovalEnum,
+        admin_id: str,
+        ids: Optional[List[str]] = None,
+        history_filter: Optional[BulkHistoryFilter] = None,
+    ) -> BulkHistoryResponseData:
+        return await HistoryService.bulk_transition(
+            HistoryService.review_fields(approved, admin_id, HistoryService.transition_time()),
+            REVIEW_FROM_STATES, {}, ids, history_filter,
+        )
+
+    @staticmethod
+    def transition_time() -> datetime:
+        # Mongo keeps milliseconds, updated_at then reads back exactly as written
+        now = datetime.now()
+        return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+    @staticmethod
+    async def bulk_transition(
+        fields: dict,
+        from_states: List[Optional[str]],
+        owner: dict,
+        ids: Optional[List[str]],
+        history_filter: Optional[BulkHistoryFilter],
+    ) -> BulkHistoryResponseData:
+        """Sets fields on the given ids, or on the items matching the filter,
+        that are in one of from_states, bulk_chunk_ids items per write"""
+        collection = History.get_motor_collection()
+        outcomes: Dict[str, str] = {}
+        truncated = False
+        if ids is not None:
+            if len(ids) > settings.bulk_max_ids:
+                raise BadRequestException(f"At most {settings.bulk_max_ids} ids per request")
+            for history_id in ids:
+                outcomes[history_id] = BULK_NOT_FOUND
+            object_ids = [ObjectId(history_id) for history_id in outcomes if ObjectId.is_valid(history_id)]
+        else:
+            query = HistoryService.build_history_query(
+                history_filter.min_date, history_filter.max_date, history_filter.classifier,
+                user_id=history_filter.submitter_id,
+            ).find({"approved": {"$in": from_states}})
+            documents = await collection.find(query.get_filter_query(), {"_id": 1}) \
+                .sort(HISTORY_SORT_KEYS).limit(settings.bulk_max_ids + 1).to_list(None)
+            truncated = len(documents) > settings.bulk_max_ids
+            object_ids = [document["_id"] for document in documents[:settings.bulk_max_ids]]
+
+        chunk_ids = max(1, settings.bulk_chunk_ids)
+        for start in range(0, len(object_ids), chunk_ids):
+            documents = await collection.find(
+                {"_id": {"$in": object_ids[start:start + chunk_ids]}, **owner}, TRANSITION_PROJECTION,
+            ).to_list(None)
+            eligible = []
+            for document in documents:
+                if document.get("approved") in from_states:
+                    eligible.append(document)
+                else:
+                    outcomes[str(document["_id"])] = BULK_INVALID_STATE
+            for document in eligible:
+                outcomes[str(document["_id"])] = BULK_CONFLICT
+            for document in await HistoryService.apply_transition(collection, eligible, fields):
+                outcomes[str(document["_id"])] = BULK_UPDATED
+
+        results = [BulkHistoryResultData(id=history_id, outcome=outcome) for history_id, outcome in outcomes.items()]
+        return BulkHistoryResponseData(
+            updated=sum(result.outcome == BULK_UPDATED for result in results),
+            results=results,
+            truncated=truncated,
+        )
+
+    @staticmethod
+    async def apply_transition(collection, documents: List[dict], fields: dict) -> List[dict]:
+        """Writes fields to the documents still in the state they were read in,
+        one UpdateMany per old state, and returns the documents it changed"""
+        if not documents:
+            return []
+        by_state = defaultdict(list)
+        for document in documents:
+            by_state[document.get("approved")].append(document["_id"])
+        result = await collection.bulk_write([
+            UpdateMany({"_id": {"$in": object_ids}, "approved": approved}, {"$set": fields})
+            for approved, object_ids in by_state.items()
+        ], ordered=False)
+        updated = documents
+        if result.matched_count < len(documents):
+            # Some changed since they were read, keep the ones holding our write
+            ours = await collection.find(
+                {"_id": {"$in": [document["_id"] for document in documents]}, **fields}, {"_id": 1},
+            ).to_list(None)
+            ours = {document["_id"] for document in ours}
+            updated = [document for document in documents if document["_id"] in ours]
+        await RollupService.record_approval_changes(updated, fields["approved"])
+        ReportService.invalidate_approval_changes(updated, fields["approved"])
+        return updated
+
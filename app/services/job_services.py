@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+from typing import List, Optional
+
+from beanie import PydanticObjectId
+from beanie.odm.queries.find import FindMany
+
+from app.models.history import History
+from app.models.job import Job, JobStatusEnum
+from app.models.user import UserRoleEnum
+from app.dto.job_dto import JobResponseData
+from app.dto.report_dto import HistoryResponseData
+from app.helpers.exceptions import NotFoundException
+from app.services.prediction_services import PredictionService
+from config.config import get_settings
+
+_logger = logging.getLogger(__name__)
+
+settings = get_settings()
+# Jobs run in the background of the worker that accepted them, at most
+# job_max_concurrency at a time, the rest wait queued
+_job_slots = asyncio.Semaphore(settings.job_max_concurrency)
+_job_tasks = set()
+
+class JobService:
+    @staticmethod
+    async def create_job(file_path: str, file_name: Optional[str], user_id: str, role: str) -> JobResponseData:
+        job = Job(
+            submitter_id=user_id,
+            submitter_role=role,
+            file_name=file_name,
+            status=JobStatusEnum.Queued,
+            total_bytes=os.path.getsize(file_path),
+            created_at=datetime.now(),
+            updated_at=datetime.now(),
+        )
+        await job.insert()
+        # Not tied to the request, the job keeps running if the client disconnects
+        task = asyncio.create_task(JobService.run_job(job, file_path))
+        _job_tasks.add(task)
+        task.add_done_callback(_job_tasks.discard)
+        _logger.info(f"Job {job.id} queued for {file_name}")
+        return JobService.to_response(job)
+
+    @staticmethod
+    async def run_job(job: Job, file_path: str):
+        try:
+            async with _job_slots:
+                now = datetime.now()
+                await job.set({Job.status: JobStatusEnum.Running, Job.started_at: now, Job.updated_at: now})
+                deduplicator = PredictionService.new_deduplicator()
+                async for prediction_data, bytes_done in PredictionService.iter_file_predictions(
+                    file_path, job.submitter_id, job.submitter_role.value,
+                    job_id=str(job.id), deduplicator=deduplicator,
+                ):
+                    await job.set({
+                        Job.rows_done: job.rows_done + len(prediction_data),
+                        Job.urls_scored: deduplicator.upload.scored,
+                        Job.bytes_done: bytes_done,
+                        Job.updated_at: datetime.now(),
+                    })
+                now = datetime.now()
+                await job.set({
+                    Job.status: JobStatusEnum.Completed,
+                    Job.bytes_done: job.total_bytes,
+                    Job.finished_at: now,
+                    Job.updated_at: now,
+                })
+                _logger.info(f"Job {job.id} completed with {job.rows_done} rows")
+        except asyncio.CancelledError:
+            await JobService.fail_job(job, "Interrupted by server shutdown")
+            raise
+        except Exception as e:
+            _logger.exception(f"Job {job.id} failed")
+            await JobService.fail_job(job, str(e) or type(e).__name__)
+        finally:
+            os.unlink(file_path)
+
+    @staticmethod
+    async def fail_job(job: Job, error: str):
+        now = datetime.now()
+        await job.set({
+            Job.status: JobStatusEnum.Failed,
+            Job.error: error,
+            Job.finished_at: now,
+            Job.updated_at: now,
+        })
+
+    @staticmethod
+    async def shutdown():
+        for task in list(_job_tasks):
+            task.cancel()
+        await asyncio.gather(*_job_tasks, return_exceptions=True)
+
+    @staticmethod
+    def to_response(job: Job) -> JobResponseData:
+        rows_per_second = None
+        eta_seconds = None
+        if job.started_at is not None:
+            elapsed = ((job.finished_at or datetime.now()) - job.started_at).total_seconds()
+            if elapsed > 0:
+                rows_per_second = job.rows_done / elapsed
+                if job.status == JobStatusEnum.Running and job.bytes_done:
+                    # Rows per byte is only known for the part already read
+                    eta_seconds = elapsed * (job.total_bytes - job.bytes_done) / job.bytes_done
+        return JobResponseData(
+            _id=job.id,
+            file_name=job.file_name,
+            status=job.status.value,
+            total_bytes=job.total_bytes,
+            bytes_done=job.bytes_done,
+            rows_done=job.rows_done,
+            dedupe_ratio=1 - job.urls_scored / job.rows_done if job.rows_done else 0.0,
+            rows_per_second=rows_per_second,
+            eta_seconds=eta_seconds,
+            error=job.error,
+            created_at=job.created_at,
+            started_at=job.started_at,
+            finished_at=job.finished_at,
+        )
+
+    @staticmethod
+    async def get_job(job_id: str, user_id: str, role: str) -> Job:
+        job = await Job.find_one(Job.id == PydanticObjectId(job_id))
+        if job is None or (role != UserRoleEnum.ADMIN.value and job.submitter_id != user_id):
+            raise NotFoundException("Job not found")
+        return job
+
+    @staticmethod
+    async def get_job_status(job_id: str, user_id: str, role: str) -> JobResponseData:
+        job = await JobService.get_job(job_id, user_id, role)
+        return JobService.to_response(job)
+
+    @staticmethod
+    def build_job_results_query(job_id: str) -> FindMany[History]:
+        return History.find(History.job_id == job_id).sort(+History.id)
+
+    @staticmethod
+    async def get_job_results(
+        job_id: str,
+        user_id: str,
+        role: str,
+        page: int,
+        size: int,
+    ) -> tuple[List[HistoryResponseData], int]:
+        job = await JobService.get_job(job_id, user_id, role)
+        query = JobService.build_job_results_query(str(job.id))
+        skip = (page - 1) * size
+        count = await query.count()
+        history_data = await query.skip(skip).limit(size).project(HistoryResponseData).to_list()
+        return history_data, count
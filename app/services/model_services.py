@@ -0,0 +1,34 @@
+import asyncio
+import logging
+
+from app.dto.model_dto import ModelRegistryResponseData
+from app.helpers.exceptions import BadRequestException, NotFoundException
+from app.helpers.prediction import registry, INFERENCE_SIDECAR
+from config.config import get_settings
+
+_logger = logging.getLogger(__name__)
+
+settings = get_settings()
+
+class ModelService:
+    @staticmethod
+    def get_registry_data() -> ModelRegistryResponseData:
+        return ModelRegistryResponseData(
+            active_version=registry.active_version(),
+            loaded_version=registry.loaded_version(),
+            versions=registry.list_versions(),
+        )
+
+    @staticmethod
+    async def activate(version: str) -> ModelRegistryResponseData:
+        if version not in registry.list_versions():
+            raise NotFoundException("Model version not found")
+        # With the sidecar the models are loaded and swapped by the inference server
+        load = settings.inference_mode != INFERENCE_SIDECAR
+        try:
+            await asyncio.to_thread(registry.activate, version, load)
+        except Exception as e:
+            _logger.error(f"Error loading model version {version}: {e}")
+            raise BadRequestException(f"Model version {version} could not be loaded")
+        _logger.info(f"Model version {version} activated")
+        return ModelService.get_registry_data()
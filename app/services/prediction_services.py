@@ -1,89 +1,319 @@
+import asyncio
 import logging
 from datetime import datetime
-import io
-from typing import List
+from typing import AsyncIterator, List, Optional, Tuple
 
 import pandas as pd
+from pymongo.errors import BulkWriteError
 
-from app.models.history import History, ClassifierEnum, ApprovalEnum
+from app.models.history import History, ApprovalEnum
 from app.models.user import UserRoleEnum
-from app.helpers.prediction import get_prediction
+from app.helpers.prediction import get_prediction, read_url_csv, get_model_version, warm_up, CLASS_LABELS
+from app.helpers.cache import TTLCache
+from app.helpers.verdict_cache import normalize_url, url_fingerprint
+from app.helpers.verdict_lookup import VerdictLookupStats, lookup_pipeline, resolve_prior_verdicts
+from app.helpers.batching import InferenceBatcher
+from app.helpers.executor import InferenceExecutor, EXECUTOR_THREAD
+from app.helpers.dedupe import UrlDeduplicator, DedupeStats
+from app.helpers.metrics import observe_stage, count_rows, register_stats
 from app.dto.report_dto import HistoryResponseDataWihtoutId
 from app.helpers.exceptions import BadRequestException
+from app.services.rollup_services import RollupService
+from app.services.report_services import ReportService
+from config.config import get_settings
 
 _logger = logging.getLogger(__name__)
 
+settings = get_settings()
+verdict_cache = TTLCache(
+    max_size=settings.verdict_cache_size,
+    ttl=settings.verdict_cache_ttl,
+)
+register_stats("url_classification_verdict_cache", verdict_cache.stats)
+inference_executor = InferenceExecutor(
+    kind=settings.inference_executor,
+    workers=settings.inference_workers,
+    queue_depth=settings.inference_queue_depth,
+)
+# CSV chunks are read from an open file handle that only a thread can share,
+# under the process executor they get a bounded thread pool of their own
+parse_executor = inference_executor if inference_executor.kind == EXECUTOR_THREAD else InferenceExecutor(
+    kind=EXECUTOR_THREAD,
+    workers=settings.inference_workers,
+    queue_depth=settings.inference_queue_depth,
+)
+inference_batcher = InferenceBatcher(
+    predict=lambda df: PredictionService.predict_urls(df),
+    max_batch_size=settings.inference_batch_max_size,
+    max_wait=settings.inference_batch_max_wait_ms / 1000,
+)
+upload_dedupe_stats = DedupeStats()
+verdict_lookup_stats = VerdictLookupStats()
+
 class PredictionService:
     @staticmethod
-    async def save_prediction(
-        list_of_prediction: List[History],
-    ):
-        await History.insert_many(list_of_prediction)
-        prediction_data = []
-        for prediction in list_of_prediction:
-            prediction_data.append(HistoryResponseDataWihtoutId(**prediction.model_dump()))
-        return prediction_data
-    
-    @staticmethod
-    async def get_prediction(file: bytes, user_id: str, role: str):
-        df = pd.read_csv(io.BytesIO(file), encoding='utf-8', sep=",")
-        if 'url' not in df.columns:
-            raise BadRequestException("File format is not correct")
-        _logger.info(df.head())
-        # try:
-        prediction_df = get_prediction(df)
-        # except Exception as e:
-        #     _logger.error(f"Error in prediction: {e}")
-        #     raise ValueError("File format is not correct")
-
-        history_data = []
-        approved_status = ApprovalEnum.Approved if role == UserRoleEnum.ADMIN.value else None
-        for index, row in prediction_df.iterrows():
-            history = History(
-                submitter_id=user_id,
-                submitter_role=role,
-                original_url=row['url'],
-                detection=bool(row['detection']),
-                classifier=ClassifierEnum[row['classifier']],
+    def build_history(
+        prediction_df: pd.DataFrame,
+        user_id: str,
+        role: str,
+        job_id: Optional[str] = None,
+    ) -> Tuple[List[dict], List[HistoryResponseDataWihtoutId]]:
+        """Builds the History documents to insert and the matching response
+        items straight from the prediction columns, skipping per row validation"""
+        submitter_role = UserRoleEnum(role).value
+        approved_status = ApprovalEnum.Approved.value if role == UserRoleEnum.ADMIN.value else None
+        now = datetime.now()
+        urls = prediction_df['url'].tolist()
+        detections = prediction_df['detection'].tolist()
+        # Class labels are the ClassifierEnum values
+        classifiers = prediction_df['classifier'].astype(object).tolist()
+        model_versions = prediction_df['model_version'].tolist()
+        documents = [
+            {
+                "created_at": now,
+                "updated_at": now,
+                "submitter_id": user_id,
+                "submitter_role": submitter_role,
+                "original_url": url,
+                "detection": detection,
+                "classifier": classifier,
+                "need_review": False,
+                "approved": approved_status,
+                "approved_at": None,
+                "approved_by": None,
+                "model_version": model_version,
+                "job_id": job_id,
+                "url_fingerprint": url_fingerprint(url),
+            }
+            for url, detection, classifier, model_version in zip(urls, detections, classifiers, model_versions)
+        ]
+        prediction_data = [
+            HistoryResponseDataWihtoutId.model_construct(
+                original_url=url,
+                detection=detection,
+                classifier=classifier,
                 need_review=False,
                 approved=approved_status,
                 approved_at=None,
                 approved_by=None,
-                created_at=datetime.now(),
-                updated_at=datetime.now(),
+                created_at=now,
+                model_version=model_version,
             )
-            history_data.append(history)
+            for url, detection, classifier, model_version in zip(urls, detections, classifiers, model_versions)
+        ]
+        return documents, prediction_data
 
-        prediction_data = await PredictionService.save_prediction(history_data)
-        return prediction_data
+    @staticmethod
+    async def save_prediction(documents: List[dict]):
+        """Inserts the documents as unordered bulk writes of
+        history_write_chunk_rows, all chunks in flight at once"""
+        if not documents:
+            return
+        collection = History.get_motor_collection()
+        chunk_rows = max(1, settings.history_write_chunk_rows)
+        with observe_stage("history_insert"):
+            await asyncio.gather(*(
+                PredictionService._insert_chunk(collection, documents[start:start + chunk_rows])
+                for start in range(0, len(documents), chunk_rows)
+            ))
+
+    @staticmethod
+    async def _insert_chunk(collection, documents: List[dict]):
+        try:
+            await collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            # Only count the documents that made it in, then fail as before
+            failed = {error["index"] for error in e.details.get("writeErrors", [])}
+            inserted = [document for index, document in enumerate(documents) if index not in failed]
+            await RollupService.record_inserted(inserted)
+            ReportService.invalidate_rows(PredictionService.report_rows(inserted))
+            raise
+        await RollupService.record_inserted(documents)
+        ReportService.invalidate_rows(PredictionService.report_rows(documents))
+
+    @staticmethod
+    def report_rows(documents: List[dict]):
+        return (
+            (document["submitter_id"], document["created_at"], document["approved"])
+            for document in documents
+        )
+
+    @staticmethod
+    async def iter_file_predictions(
+        file_path: str,
+        user_id: str,
+        role: str,
+        job_id: Optional[str] = None,
+        deduplicator: Optional[UrlDeduplicator] = None,
+    ) -> AsyncIterator[Tuple[List[HistoryResponseDataWihtoutId], int]]:
+        """Parses, scores and saves the url file one chunk of rows at a time,
+        yielding each chunk's predictions with the bytes of the file read so far.
+        A chunk is written while the next one is parsed and scored"""
+        if deduplicator is None:
+            deduplicator = PredictionService.new_deduplicator()
+        with open(file_path, "rb") as file:
+            try:
+                reader = await parse_executor.run(read_url_csv, file, settings.upload_chunk_rows)
+            except ValueError:
+                raise BadRequestException("File format is not correct")
+            pending_write = None
+            try:
+                with reader:
+                    while True:
+                        with observe_stage("csv_parse"):
+                            df = await parse_executor.run(next, reader, None)
+                        if df is None:
+                            break
+                        bytes_read = file.tell()
+                        df = df.dropna(subset=['url'])
+                        if df.empty:
+                            continue
+                        prediction_df = await deduplicator.predict(df)
+                        with observe_stage("build_history"):
+                            documents, prediction_data = PredictionService.build_history(
+                                prediction_df, user_id, role, job_id
+                            )
+                        count_rows("predicted", len(prediction_data))
+                        if pending_write is not None:
+                            yield await pending_write
+                        pending_write = asyncio.ensure_future(
+                            PredictionService._save_chunk(documents, prediction_data, bytes_read)
+                        )
+                if pending_write is not None:
+                    yield await pending_write
+                    pending_write = None
+            finally:
+                if pending_write is not None:
+                    pending_write.cancel()
+
+    @staticmethod
+    async def _save_chunk(
+        documents: List[dict],
+        prediction_data: List[HistoryResponseDataWihtoutId],
+        bytes_read: int,
+    ) -> Tuple[List[HistoryResponseDataWihtoutId], int]:
+        await PredictionService.save_prediction(documents)
+        return prediction_data, bytes_read
+
+    @staticmethod
+    async def find_prior_verdicts(urls: List[str]) -> List[Optional[tuple]]:
+        """Batch looks up the verdict History already holds for each url,
+        (detection, classifier, model_version) or None"""
+        model_version = get_model_version()
+        fingerprints = [url_fingerprint(url) for url in urls]
+        with observe_stage("verdict_lookup"):
+            groups = await History.get_motor_collection().aggregate(
+                lookup_pipeline(set(fingerprints), model_version)
+            ).to_list(None)
+        verdicts = resolve_prior_verdicts(groups, model_version)
+        prior = [verdicts.get(fingerprint) for fingerprint in fingerprints]
+        hits = [verdict for verdict in prior if verdict is not None]
+        verdict_lookup_stats.record(len(urls), len(hits), sum(verdict[3] for verdict in hits))
+        return [verdict[:3] if verdict is not None else None for verdict in prior]
+
+    @staticmethod
+    async def predict_urls(df: pd.DataFrame) -> pd.DataFrame:
+        """Scores the urls, reusing prior verdicts from History when the
+        lookup is enabled so only the misses reach the ensemble"""
+        if not settings.verdict_lookup_enabled:
+            with observe_stage("inference"):
+                return await inference_executor.run(get_prediction, df)
+        urls = df['url'].tolist()
+        prior = await PredictionService.find_prior_verdicts(urls)
+        misses = [index for index, verdict in enumerate(prior) if verdict is None]
+        if misses:
+            with observe_stage("inference"):
+                prediction_df = await inference_executor.run(
+                    get_prediction, pd.DataFrame({'url': [urls[index] for index in misses]})
+                )
+            for index, detection, classifier, model_version in zip(
+                misses,
+                prediction_df['detection'].tolist(),
+                prediction_df['classifier'].astype(object).tolist(),
+                prediction_df['model_version'].tolist(),
+            ):
+                prior[index] = (detection, classifier, model_version)
+        detections, classifiers, model_versions = zip(*prior) if prior else ((), (), ())
+        return pd.DataFrame({
+            'url': urls,
+            'detection': pd.Series(detections, dtype=bool),
+            'classifier': pd.Categorical(classifiers, dtype=CLASS_LABELS),
+            'model_version': pd.Series(model_versions, dtype=object),
+        })
+
+    @staticmethod
+    def new_deduplicator() -> UrlDeduplicator:
+        return UrlDeduplicator(
+            predict=PredictionService.predict_urls,
+            max_urls=settings.upload_dedupe_max_urls,
+            totals=upload_dedupe_stats,
+        )
+
+    @staticmethod
+    async def get_prediction(file_path: str, user_id: str, role: str):
+        deduplicator = PredictionService.new_deduplicator()
+        prediction_data = []
+        async for chunk_data, _ in PredictionService.iter_file_predictions(
+            file_path, user_id, role, deduplicator=deduplicator
+        ):
+            prediction_data += chunk_data
+        return prediction_data, deduplicator.upload
     
+    @staticmethod
+    def get_cache_stats() -> dict:
+        return verdict_cache.stats()
+
+    @staticmethod
+    def get_batch_stats() -> dict:
+        return inference_batcher.stats()
+
+    @staticmethod
+    def get_executor_stats() -> dict:
+        stats = inference_executor.stats()
+        if parse_executor is not inference_executor:
+            stats["parse"] = parse_executor.stats()
+        return stats
+
+    @staticmethod
+    def get_dedupe_stats() -> dict:
+        return upload_dedupe_stats.stats()
+
+    @staticmethod
+    def get_verdict_lookup_stats() -> dict:
+        return {"enabled": settings.verdict_lookup_enabled, **verdict_lookup_stats.stats()}
+
+    @staticmethod
+    def warm_up():
+        warm_up()
+
+    @staticmethod
+    def shutdown():
+        inference_executor.shutdown()
+        parse_executor.shutdown()
+
+    @staticmethod
+    async def predict_single(url: str) -> pd.DataFrame:
+        # Verdicts are only reused for the ensemble that produced them, one
+        # scored by another version than expected (a rollout under way) is not kept
+        expected_version = get_model_version()
+        detection, classifier, model_version = await verdict_cache.get_or_compute(
+            (expected_version, normalize_url(url)),
+            lambda: inference_batcher.submit(url),
+            cacheable=lambda verdict: verdict[2] == expected_version,
+        )
+        return pd.DataFrame({
+            'url': [url],
+            'detection': [detection],
+            'classifier': pd.Categorical([classifier], dtype=CLASS_LABELS),
+            'model_version': [model_version],
+        })
+
     @staticmethod
     async def get_single_prediction(url: str, user_id: str, role: str):
-        df = pd.DataFrame({'url': [url]})
-        # try:
-        prediction_df = get_prediction(df)
-        # except Exception as e:
-        #     _logger.error(f"Error in prediction: {e}")
-        #     raise ValueError("File format is not correct")
-
-        history_data = []
-        approved_status = ApprovalEnum.Approved if role == UserRoleEnum.ADMIN.value else None
-        for index, row in prediction_df.iterrows():
-            history = History(
-                submitter_id=user_id,
-                submitter_role=role,
-                original_url=row['url'],
-                detection=bool(row['detection']),
-                classifier=ClassifierEnum[row['classifier']],
-                need_review=False,
-                approved=approved_status,
-                approved_at=None,
-                approved_by=None,
-                created_at=datetime.now(),
-                updated_at=datetime.now(),
-            )
-            history_data.append(history)
+        prediction_df = await PredictionService.predict_single(url)
+
+        documents, prediction_data = PredictionService.build_history(prediction_df, user_id, role)
+        count_rows("predicted", len(prediction_data))
 
-        prediction_data = await PredictionService.save_prediction(history_data)
+        await PredictionService.save_prediction(documents)
         return prediction_data
-    
\ No newline at end of file
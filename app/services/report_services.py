@@ -1,15 +1,45 @@
 import logging
-from datetime import datetime
-from typing import List, Optional
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from beanie.odm.queries.find import FindMany
 
 from app.models.history import History, ClassifierEnum, ApprovalEnum
 from app.dto.report_dto import ReportResponseData, ClassifierResponseData
+from app.database.factory import analytics_collection, analytics_reads_may_lag
+from app.helpers.metrics import register_stats
+from app.helpers.report_cache import ReportCache, naive_utc
+from app.services.rollup_services import RollupService, start_of_day
+from config.config import get_settings
 
 _logger = logging.getLogger(__name__)
 
+settings = get_settings()
+
+
+def report_cache_settle_seconds() -> float:
+    # Reports read on the primary see every write once it is acknowledged
+    if not analytics_reads_may_lag():
+        return 0
+    if settings.report_cache_settle_seconds is not None:
+        return settings.report_cache_settle_seconds
+    # A secondary can lag by up to maxStalenessSeconds when one is set
+    if settings.mongo_analytics_max_staleness_seconds > 0:
+        return settings.mongo_analytics_max_staleness_seconds
+    return 10
+
+
+report_cache = ReportCache(
+    max_size=settings.report_cache_size,
+    ttl=settings.report_cache_ttl,
+    settle_seconds=report_cache_settle_seconds(),
+)
+register_stats("url_classification_report_cache", report_cache.stats)
+
 class ReportService:
     @staticmethod
-    async def get_report_data(min_date: datetime, max_date: datetime, user_id: Optional[str] = None):
+    def build_report_query(min_date: datetime, max_date: datetime, user_id: Optional[str] = None) -> FindMany[History]:
         if user_id is not None:
             query = History.find(
                 History.submitter_id == user_id,
@@ -22,25 +52,113 @@ class ReportService:
                 History.created_at >= min_date,
                 History.created_at <= max_date
             )
-        
-        # Get aggregated data
-        query_copy = query.clone()
-        report_data = ReportResponseData()
-        report_data.total = await query.count()
+        return query
+
+    @staticmethod
+    async def count_groups(query: FindMany[History]) -> List[dict]:
+        # Count every (detection, classifier) pair in one pass over the range
+        return await analytics_collection(History).aggregate([
+            {"$match": query.get_filter_query()},
+            {"$group": {
+                "_id": {"detection": "$detection", "classifier": "$classifier"},
+                "total": {"$sum": 1},
+            }},
+        ]).to_list(None)
+
+    @staticmethod
+    async def get_report_groups(min_date: datetime, max_date: datetime, user_id: Optional[str] = None) -> List[dict]:
+        if not settings.report_use_rollups:
+            return await ReportService.count_groups(ReportService.build_report_query(min_date, max_date, user_id))
+        return await ReportService.get_rollup_report_groups(min_date, max_date, user_id)
+
+    @staticmethod
+    async def get_rollup_report_groups(min_date: datetime, max_date: datetime, user_id: Optional[str] = None) -> List[dict]:
+        """Whole days come from the rollups, only the partial days at both
+        ends of the range are counted from History"""
+        # Rollup days are midnights of the naive UTC dates History stores
+        min_date, max_date = naive_utc(min_date), naive_utc(max_date)
+        query = ReportService.build_report_query(min_date, max_date, user_id)
+        first_day = start_of_day(min_date)
+        if first_day < min_date:
+            first_day += timedelta(days=1)
+        last_day = start_of_day(max_date)
+        if first_day >= last_day:
+            return await ReportService.count_groups(query)
+        approved = ApprovalEnum.Approved.value if user_id is None else None
+        return (
+            await ReportService.count_groups(query.find(History.created_at < first_day))
+            + await RollupService.get_report_groups(first_day, last_day, user_id, approved)
+            + await ReportService.count_groups(ReportService.build_report_query(last_day, max_date, user_id))
+        )
+
+    @staticmethod
+    async def check_rollups(min_date: datetime, max_date: datetime, user_id: Optional[str] = None) -> dict:
+        """(detection, classifier) totals the rollups get wrong against a full
+        scan of History, as {pair: (rollup total, scanned total)}"""
+        def totals(groups: List[dict]) -> Counter:
+            counter = Counter()
+            for group in groups:
+                counter[(group["_id"].get("detection"), group["_id"].get("classifier"))] += group["total"]
+            return counter
+
+        rollup = totals(await ReportService.get_rollup_report_groups(min_date, max_date, user_id))
+        scanned = totals(await ReportService.count_groups(ReportService.build_report_query(min_date, max_date, user_id)))
+        return {
+            pair: (rollup[pair], scanned[pair])
+            for pair in rollup.keys() | scanned.keys()
+            if rollup[pair] != scanned[pair]
+        }
+
+    @staticmethod
+    async def get_report_data(min_date: datetime, max_date: datetime, user_id: Optional[str] = None) -> ReportResponseData:
+        return await report_cache.get_or_compute(
+            ReportCache.report_key(min_date, max_date, user_id),
+            lambda: ReportService.compute_report_data(min_date, max_date, user_id),
+        )
 
-        # Get detection data
-        report_data.detection_benign = await query_copy.find(History.detection == False).count()
-        query_copy = query.clone()
-        report_data.detection_malware = await query_copy.find(History.detection == True).count()
-        query_copy = query.clone()
+    @staticmethod
+    async def compute_report_data(min_date: datetime, max_date: datetime, user_id: Optional[str] = None) -> ReportResponseData:
+        groups = await ReportService.get_report_groups(min_date, max_date, user_id)
+
+        report_data = ReportResponseData()
+        classifier_totals = {enum_value.value: 0 for enum_value in ClassifierEnum}
+        for group in groups:
+            report_data.total += group["total"]
+            if group["_id"].get("detection") is True:
+                report_data.detection_malware += group["total"]
+            elif group["_id"].get("detection") is False:
+                report_data.detection_benign += group["total"]
+            if group["_id"].get("classifier") in classifier_totals:
+                classifier_totals[group["_id"]["classifier"]] += group["total"]
 
         # Get classifier data
-        report_data.classifier = []
-        for enum_value in ClassifierEnum:
-            classifier_data = ClassifierResponseData(
-                type=enum_value.value,
-                total=await query_copy.find(History.classifier == enum_value.value).count()
-            )
-            query_copy = query.clone()
-            report_data.classifier.append(classifier_data)
-        return report_data
\ No newline at end of file
+        report_data.classifier = [
+            ClassifierResponseData(type=classifier, total=total)
+            for classifier, total in classifier_totals.items()
+        ]
+        return report_data
+
+    @staticmethod
+    def invalidate_rows(rows: Iterable[Tuple[str, datetime, Optional[str]]]):
+        """Drops the cached reports counting any of the inserted or deleted
+        (submitter_id, created_at, approved) rows"""
+        windows: Dict[Tuple[str, bool], Tuple[datetime, datetime]] = {}
+        for submitter_id, created_at, approved in rows:
+            key = (submitter_id, approved == ApprovalEnum.Approved.value)
+            first, last = windows.get(key, (created_at, created_at))
+            windows[key] = (min(first, created_at), max(last, created_at))
+        for (submitter_id, admin), (first, last) in windows.items():
+            report_cache.invalidate_window(first, last, submitter_id, admin)
+
+    @staticmethod
+    def invalidate_approval_changes(documents: List[dict], new_approved: Optional[str]):
+        # Raw documents read in their old state
+        if new_approved != ApprovalEnum.Approved.value:
+            documents = [document for document in documents if document.get("approved") == ApprovalEnum.Approved.value]
+        if documents:
+            created_at = [document["created_at"] for document in documents]
+            report_cache.invalidate_window(min(created_at), max(created_at), admin=True)
+
+    @staticmethod
+    def get_cache_stats() -> dict:
+        return report_cache.stats()
@@ -0,0 +1,149 @@
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from app.database.factory import analytics_collection
+from app.models.history import History
+from app.models.history_rollup import HistoryRollup
+
+_logger = logging.getLogger(__name__)
+
+# (day, submitter_id, detection, classifier, approved)
+RollupKey = Tuple[datetime, str, bool, str, Optional[str]]
+
+
+def start_of_day(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def rollup_key(document: dict) -> RollupKey:
+    """Key of a raw History document"""
+    return (
+        start_of_day(document["created_at"]),
+        document["submitter_id"],
+        document["detection"],
+        document["classifier"],
+        document.get("approved"),
+    )
+
+
+class RollupService:
+    @staticmethod
+    async def increment(changes: Counter):
+        """Applies the count changes per rollup key, each one an atomic upserted $inc"""
+        now = datetime.now()
+        requests = [
+            UpdateOne(
+                {
+                    "day": day,
+                    "submitter_id": submitter_id,
+                    "detection": detection,
+                    "classifier": classifier,
+                    "approved": approved,
+                },
+                {
+                    "$inc": {"total": delta},
+                    "$set": {"updated_at": now},
+                    "$setOnInsert": {"created_at": now},
+                },
+                upsert=True,
+            )
+            for (day, submitter_id, detection, classifier, approved), delta in changes.items()
+            if delta
+        ]
+        if requests:
+            await HistoryRollup.get_motor_collection().bulk_write(requests, ordered=False)
+
+    @staticmethod
+    async def record_inserted(documents: Iterable[dict]):
+        await RollupService.increment(Counter(rollup_key(document) for document in documents))
+
+    @staticmethod
+    async def record_approval_changes(documents: Iterable[dict], new_approved: Optional[str]):
+        """Moves raw History documents read in their old state to new_approved"""
+        changes = Counter()
+        for document in documents:
+            changes[rollup_key(document)] -= 1
+            changes[rollup_key({**document, "approved": new_approved})] += 1
+        await RollupService.increment(changes)
+
+    @staticmethod
+    async def record_deleted(documents: Iterable[dict]):
+        """Removes raw History documents as they were when deleted"""
+        changes = Counter()
+        for document in documents:
+            changes[rollup_key(document)] -= 1
+        await RollupService.increment(changes)
+
+    @staticmethod
+    async def get_report_groups(
+        min_day: datetime,
+        max_day: datetime,
+        user_id: Optional[str] = None,
+        approved: Optional[str] = None,
+    ) -> List[dict]:
+        """Totals per (detection, classifier) of the days in [min_day, max_day)"""
+        match = {"day": {"$gte": min_day, "$lt": max_day}}
+        if user_id is not None:
+            match["submitter_id"] = user_id
+        if approved is not None:
+            match["approved"] = approved
+        return await analytics_collection(HistoryRollup).aggregate([
+            {"$match": match},
+            {"$group": {
+                "_id": {"detection": "$detection", "classifier": "$classifier"},
+                "total": {"$sum": "$total"},
+            }},
+        ]).to_list(None)
+
+    @staticmethod
+    async def rebuild(min_day: Optional[datetime] = None, max_day: Optional[datetime] = None) -> int:
+        """Recounts the rollups of the days in [min_day, max_day) from History,
+        writes made while it runs may be missed, run it when traffic is low"""
+        history_match = {}
+        rollup_match = {}
+        if min_day is not None:
+            history_match.setdefault("created_at", {})["$gte"] = min_day
+            rollup_match.setdefault("day", {})["$gte"] = min_day
+        if max_day is not None:
+            history_match.setdefault("created_at", {})["$lt"] = max_day
+            rollup_match.setdefault("day", {})["$lt"] = max_day
+        groups = await History.get_motor_collection().aggregate([
+            {"$match": history_match},
+            {"$group": {
+                "_id": {
+                    "year": {"$year": "$created_at"},
+                    "month": {"$month": "$created_at"},
+                    "day": {"$dayOfMonth": "$created_at"},
+                    "submitter_id": "$submitter_id",
+                    "detection": "$detection",
+                    "classifier": "$classifier",
+                    "approved": "$approved",
+                },
+                "total": {"$sum": 1},
+            }},
+        ], allowDiskUse=True).to_list(None)
+
+        now = datetime.now()
+        rollups = [
+            {
+                "created_at": now,
+                "updated_at": now,
+                "day": datetime(group["_id"]["year"], group["_id"]["month"], group["_id"]["day"]),
+                "submitter_id": group["_id"]["submitter_id"],
+                "detection": group["_id"]["detection"],
+                "classifier": group["_id"]["classifier"],
+                "approved": group["_id"].get("approved"),
+                "total": group["total"],
+            }
+            for group in groups
+        ]
+        collection = HistoryRollup.get_motor_collection()
+        await collection.delete_many(rollup_match)
+        if rollups:
+            await collection.insert_many(rollups, ordered=False)
+        _logger.info(f"Rebuilt {len(rollups)} history rollups")
+        return len(rollups)
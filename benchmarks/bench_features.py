@@ -0,0 +1,51 @@
+"""Parity check and throughput of the batch feature engine
+
+Run from the repository root: python -m benchmarks.bench_features
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from app.helpers.features import FEATURE_COLUMNS, extract_features_batch
+from app.helpers.prediction import extract_features
+from benchmarks.corpus import generate_urls
+
+
+def check_parity(urls):
+    expected = pd.DataFrame([extract_features(url) for url in urls])[FEATURE_COLUMNS]
+    actual = extract_features_batch(urls)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False)
+
+
+def urls_per_second(func, urls, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(urls)
+        best = min(best, time.perf_counter() - start)
+    return len(urls) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 1_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    check_parity(generate_urls(20_000, seed=7))
+    print('parity: ok')
+
+    def per_url(urls):
+        return pd.DataFrame([extract_features(url) for url in urls])
+
+    print(f"{'rows':>8} {'per-url urls/s':>16} {'batch urls/s':>16} {'speedup':>8}")
+    for size in args.sizes:
+        urls = generate_urls(size)
+        before = urls_per_second(per_url, urls, args.repeat)
+        after = urls_per_second(extract_features_batch, urls, args.repeat)
+        print(f"{size:>8} {before:>16,.0f} {after:>16,.0f} {after / before:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
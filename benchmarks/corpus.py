@@ -0,0 +1,91 @@
+import random
+from typing import List
+
+_WORDS = ['home', 'news', 'shop', 'blog', 'docs', 'help', 'about', 'media', 'static', 'cart']
+_PHISHING_WORDS = ['login', 'signin', 'account', 'update', 'bank', 'paypal', 'bonus', 'ebay', 'verify']
+_TLDS = ['com', 'net', 'org', 'io', 'ru', 'cn', 'info', 'xyz', 'de', 'co.uk']
+_SHORTENERS = ['bit.ly', 'goo.gl', 'tinyurl.com', 'ow.ly', 'is.gd', 'tiny.cc', 'x.co']
+
+
+def _domain(rng: random.Random) -> str:
+    name = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(3, 12)))
+    if rng.random() < 0.3:
+        name = f"{name}-{rng.choice(_WORDS)}"
+    prefix = 'www.' if rng.random() < 0.4 else ''
+    return f"{prefix}{name}.{rng.choice(_TLDS)}"
+
+
+def _path(rng: random.Random, words: List[str]) -> str:
+    segments = [rng.choice(words) for _ in range(rng.randint(0, 4))]
+    path = '/' + '/'.join(segments) if segments else ''
+    if rng.random() < 0.3:
+        path += f"?id={rng.randint(0, 99999)}&ref={rng.choice(words)}"
+    return path
+
+
+def benign_url(rng: random.Random) -> str:
+    scheme = rng.choice(['https://', 'http://', ''])
+    return f"{scheme}{_domain(rng)}{_path(rng, _WORDS)}"
+
+
+def phishing_url(rng: random.Random) -> str:
+    brand = rng.choice(_PHISHING_WORDS)
+    host = f"{brand}-{_domain(rng)}" if rng.random() < 0.5 else _domain(rng)
+    url = f"http://{host}{_path(rng, _PHISHING_WORDS)}"
+    if rng.random() < 0.3:
+        url += f"@{_domain(rng)}"
+    if rng.random() < 0.2:
+        url += "%20" + "//" + _domain(rng)
+    return url
+
+
+def ip_url(rng: random.Random) -> str:
+    ip = '.'.join(str(rng.randint(0, 255)) for _ in range(4))
+    port = f":{rng.randint(1, 65535)}" if rng.random() < 0.3 else ''
+    scheme = rng.choice(['http://', 'https://', ''])
+    return f"{scheme}{ip}{port}{_path(rng, _PHISHING_WORDS + _WORDS)}"
+
+
+def shortener_url(rng: random.Random) -> str:
+    token = ''.join(rng.choice('abcdefghijkLMNOPQ0123456789') for _ in range(7))
+    return f"{rng.choice(['https://', 'http://', ''])}{rng.choice(_SHORTENERS)}/{token}"
+
+
+def odd_url(rng: random.Random) -> str:
+    """Inputs that exercise urlparse corner cases"""
+    return rng.choice([
+        '',
+        ' http://leading.space.com/a',
+        'http://tab\tin.com/x\ny',
+        'https://café.fr/menü/ß',
+        'https://xn--caf-dma.fr/١٢٣',
+        'http://host.com/first;param',
+        'http://host.com/a;b/c',
+        'mailto:user@example.com',
+        'ftp://user:pw@10.0.0.1:21/pub;type=a',
+        'http://127.1/',
+        '0x7f.0.0.1/admin',
+        'http://[::1]/v6',
+        '//no-scheme.com/path?x=1#frag',
+        'localhost:8080/api',
+        'www.example.com/?q=a/b',
+        'HTTP://UPPER.COM/PATH',
+        'http://a.b.c.d.e/www/wwww/////x',
+    ])
+
+
+_GENERATORS = [
+    (benign_url, 0.55),
+    (phishing_url, 0.25),
+    (ip_url, 0.08),
+    (shortener_url, 0.1),
+    (odd_url, 0.02),
+]
+
+
+def generate_urls(size: int, seed: int = 42) -> List[str]:
+    """Synthetic mix of benign, phishing-like, IP-host and shortener urls"""
+    rng = random.Random(seed)
+    generators = [generator for generator, _ in _GENERATORS]
+    weights = [weight for _, weight in _GENERATORS]
+    return [rng.choices(generators, weights)[0](rng) for _ in range(size)]
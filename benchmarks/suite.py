@@ -0,0 +1,201 @@
+"""Benchmark suite for the prediction and persistence hot paths
+
+Covers feature extraction, each model's predict, the stacked ensemble and
+get_prediction at batch sizes 1 to 100k, chunked CSV parsing and History bulk
+inserts against an in-memory Mongo (mongomock-motor, see
+benchmarks/requirements.txt). Every case reports the best of --repeat runs.
+
+Run from the repository root:
+python -m benchmarks.suite --output results.json
+python -m benchmarks.suite --baseline results.json --fail-on-regression
+"""
+import argparse
+import asyncio
+import io
+import json
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.helpers.features import extract_features_batch
+from app.helpers.model_registry import BASE_MODEL_NAMES
+from app.helpers.prediction import registry, get_prediction, read_url_csv
+from benchmarks.corpus import generate_urls
+
+DEFAULT_SIZES = [1, 10, 100, 1_000, 10_000, 100_000]
+QUICK_SIZES = [1, 100, 10_000]
+
+
+def best_time(func: Callable[[], object], repeat: int, setup: Optional[Callable[[], object]] = None) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def result(rows: int, seconds: float) -> dict:
+    return {"rows": rows, "seconds": seconds, "rows_per_second": rows / seconds if seconds else None}
+
+
+def bench_features(urls: List[str], sizes: List[int], repeat: int) -> Dict[str, dict]:
+    return {
+        f"features/{size}": result(size, best_time(lambda: extract_features_batch(urls[:size]), repeat))
+        for size in sizes
+    }
+
+
+def bench_models(urls: List[str], sizes: List[int], repeat: int) -> Dict[str, dict]:
+    bundle = registry.get_bundle()
+    results = {}
+    for size in sizes:
+        features_df = bundle.encode_features(extract_features_batch(urls[:size]))
+        for name in BASE_MODEL_NAMES:
+            model = bundle.models[name]
+            results[f"model/{name}/{size}"] = result(size, best_time(lambda: model.predict(features_df), repeat))
+        meta_inputs = np.random.default_rng(0).integers(0, 4, size=(size, 3))
+        rf_model = bundle.models["rf_model"]
+        results[f"model/rf_model/{size}"] = result(size, best_time(lambda: rf_model.predict(meta_inputs), repeat))
+        results[f"ensemble/{size}"] = result(size, best_time(lambda: bundle.predict_ensemble(features_df), repeat))
+        df = pd.DataFrame({'url': urls[:size]})
+        results[f"get_prediction/{size}"] = result(size, best_time(lambda: get_prediction(df), repeat))
+    return results
+
+
+def bench_csv(urls: List[str], sizes: List[int], repeat: int, chunk_rows: int) -> Dict[str, dict]:
+    results = {}
+    for size in sizes:
+        data = pd.DataFrame({'url': urls[:size], 'label': 'benign'}).to_csv(index=False).encode('utf-8')
+
+        def parse():
+            with read_url_csv(io.BytesIO(data), chunk_rows) as reader:
+                for _ in reader:
+                    pass
+
+        results[f"csv_parse/{size}"] = result(size, best_time(parse, repeat))
+    return results
+
+
+def bench_history_insert(urls: List[str], sizes: List[int], repeat: int) -> Dict[str, dict]:
+    try:
+        from mongomock_motor import AsyncMongoMockClient
+    except ImportError:
+        print("mongomock-motor is not installed, skipping the History insert benchmarks", file=sys.stderr)
+        return {}
+    from beanie import init_beanie
+    from app.models.history import History
+    from app.services.prediction_services import PredictionService
+
+    async def run() -> Dict[str, dict]:
+        await init_beanie(AsyncMongoMockClient().get_database('benchmarks'), document_models=[History])
+        results = {}
+        for size in sizes:
+            prediction_df = get_prediction(pd.DataFrame({'url': urls[:size]}))
+            best = float('inf')
+            for _ in range(repeat):
+                await History.get_motor_collection().delete_many({})
+                start = time.perf_counter()
+                documents, _ = PredictionService.build_history(prediction_df, "benchmark", "user")
+                await PredictionService.save_prediction(documents)
+                best = min(best, time.perf_counter() - start)
+            results[f"history_insert/{size}"] = result(size, best)
+        return results
+
+    return asyncio.run(run())
+
+
+def metadata(args: argparse.Namespace) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "model_version": registry.active_version(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+    }
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """Prints current against baseline throughput, returns the regressed cases"""
+    regressions = []
+    print(f"{'case':<32} {'baseline rows/s':>16} {'current rows/s':>16} {'change':>8}")
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None or not before.get("rows_per_second") or not current["rows_per_second"]:
+            print(f"{name:<32} {'-':>16} {current['rows_per_second'] or 0:>16,.0f} {'new':>8}")
+            continue
+        change = current["rows_per_second"] / before["rows_per_second"] - 1
+        flag = ""
+        if change < -tolerance:
+            regressions.append(name)
+            flag = " !"
+        print(f"{name:<32} {before['rows_per_second']:>16,.0f} {current['rows_per_second']:>16,.0f} {change:>+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', help=f"batch sizes, default {DEFAULT_SIZES}")
+    parser.add_argument('--quick', action='store_true', help=f"only run batch sizes {QUICK_SIZES}")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-rows', type=int, default=5_000, help="CSV chunk size, as UPLOAD_CHUNK_ROWS")
+    parser.add_argument('--only', nargs='+', choices=['features', 'models', 'csv', 'history'])
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--baseline', help="JSON file of an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="slowdown reported as a regression")
+    parser.add_argument('--fail-on-regression', action='store_true')
+    args = parser.parse_args()
+
+    sizes = args.sizes or (QUICK_SIZES if args.quick else DEFAULT_SIZES)
+    urls = generate_urls(max(sizes), seed=args.seed)
+    only = set(args.only or ['features', 'models', 'csv', 'history'])
+
+    results = {}
+    if 'features' in only:
+        results.update(bench_features(urls, sizes, args.repeat))
+    if 'models' in only:
+        results.update(bench_models(urls, sizes, args.repeat))
+    if 'csv' in only:
+        results.update(bench_csv(urls, sizes, args.repeat, args.chunk_rows))
+    if 'history' in only:
+        results.update(bench_history_insert(urls, sizes, args.repeat))
+
+    report = {"meta": metadata(args), "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            if args.fail_on_regression:
+                sys.exit(1)
+    else:
+        print(f"{'case':<32} {'rows/s':>16} {'seconds':>10}")
+        for name, current in results.items():
+            print(f"{name:<32} {current['rows_per_second']:>16,.0f} {current['seconds']:>10.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,5 @@
 from functools import lru_cache
+from typing import Optional
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -6,7 +7,52 @@ class Settings(BaseSettings):
     secret_key: str
     algorithms: str
     mongo_dsn: str
+    mongo_max_pool_size: int = 20
+    mongo_min_pool_size: int = 0
+    mongo_wait_queue_timeout_ms: Optional[int] = None  # None waits for a connection until the operation times out
+    mongo_server_selection_timeout_ms: int = 30_000
+    mongo_connect_timeout_ms: int = 20_000
+    # Report and history listing reads, a separate DSN gets its own pool
+    mongo_analytics_dsn: Optional[str] = None
+    mongo_analytics_read_preference: str = "primary"  # e.g. secondaryPreferred or nearest
+    mongo_analytics_max_staleness_seconds: int = -1  # -1 for no limit, at least 90 otherwise
+    mongo_analytics_max_pool_size: int = 10
     allowed_origins: str
+    verdict_cache_size: int = 10_000
+    verdict_cache_ttl: float = 3600
+    inference_batch_max_size: int = 32
+    inference_batch_max_wait_ms: float = 5
+    inference_executor: str = "thread"  # thread or process
+    inference_workers: int = 2
+    inference_queue_depth: int = 16
+    inference_mode: str = "local"  # local or sidecar
+    inference_socket: str = "/tmp/url-classification-inference.sock"
+    model_registry_path: str = "ml_models"
+    model_registry_poll_seconds: float = 5
+    upload_max_bytes: int = 10_000_000
+    upload_chunk_rows: int = 5_000
+    job_max_bytes: int = 500_000_000
+    job_max_concurrency: int = 2
+    history_write_chunk_rows: int = 1_000
+    # Distinct urls an upload remembers verdicts of for its later chunks, per running upload or job.
+    # Larger values rescore fewer repeats spread far apart at the cost of memory growing with the file
+    upload_dedupe_max_urls: int = 20_000
+    verdict_lookup_enabled: bool = False
+    cascade_threshold: float = 0  # 0 disables the cascade
+    cascade_model: str = "cat_model"
+    metrics_enabled: bool = True
+    drop_stale_indexes: bool = False
+    report_use_rollups: bool = False
+    report_cache_size: int = 1_000  # 0 disables the cache
+    report_cache_ttl: float = 30  # seconds a cached report may lag writes made by other workers
+    # Seconds written reports are not cached when read from secondaries, defaults to the analytics max staleness or 10
+    report_cache_settle_seconds: Optional[float] = None
+    count_cache_size: int = 1_000
+    count_cache_ttl: float = 10
+    total_count_cap: int = 10_000
+    total_estimate_sample_size: int = 1_000
+    bulk_max_ids: int = 10_000
+    bulk_chunk_ids: int = 2_000
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
 @lru_cache()
@@ -3,8 +3,11 @@ from contextlib import asynccontextmanager
 from app import database
 from app.routers import routers
 from app.middlewares.limiters import add_limiters
+from app.middlewares.metrics import add_metrics
 from app.middlewares.exception_handlers import add_exception_handlers
 from app.middlewares.cors import apply_cors
+from app.services.prediction_services import PredictionService
+from app.services.job_services import JobService
 from config.config import get_settings
 
 settings = get_settings()
@@ -16,12 +19,19 @@ async def lifespan(app: FastAPI):
     # INIT DATABASE
     await database.initialize()
 
+    # LOAD MODELS
+    PredictionService.warm_up()
+
     # ADD ROUTES
     for router in routers:
         app.include_router(**router)
     yield
 
+    await JobService.shutdown()
+    PredictionService.shutdown()
+
 app = FastAPI(title="NetworkAttackClassificationAPI", lifespan=lifespan)    
 apply_cors(app, origins=settings.allowed_origins.split(","))
 add_limiters(app)
+add_metrics(app)
 add_exception_handlers(app)
\ No newline at end of file
@@ -0,0 +1,59 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.helpers.verdict_cache import url_fingerprint
+from app.helpers.verdict_lookup import lookup_pipeline, resolve_prior_verdicts
+from app.models.history import ApprovalEnum
+
+mongomock = pytest.importorskip("mongomock")
+
+URL = "http://example.com/login"
+NOW = datetime(2024, 1, 1)
+
+
+def history_row(model_version, approved=None, need_review=False, approved_by=None, detection=True,
+                classifier="phishing", updated_at=NOW):
+    return {
+        "original_url": URL,
+        "url_fingerprint": url_fingerprint(URL),
+        "model_version": model_version,
+        "approved": approved,
+        "need_review": need_review,
+        "approved_by": approved_by,
+        "detection": detection,
+        "classifier": classifier,
+        "updated_at": updated_at,
+    }
+
+
+def prior_verdict(rows, model_version):
+    collection = mongomock.MongoClient().db.history
+    collection.insert_many(rows)
+    groups = list(collection.aggregate(lookup_pipeline([url_fingerprint(URL)], model_version)))
+    return resolve_prior_verdicts(groups, model_version).get(url_fingerprint(URL))
+
+
+def test_admin_prediction_is_not_reused_across_model_versions():
+    # An admin's own prediction starts out Approved without any review
+    rows = [history_row("v1", approved=ApprovalEnum.Approved.value)]
+    assert prior_verdict(rows, "v2") is None
+
+
+def test_admin_prediction_is_reused_by_its_own_model_version():
+    rows = [history_row("v1", approved=ApprovalEnum.Approved.value)]
+    assert prior_verdict(rows, "v1") == (True, "phishing", "v1", False)
+
+
+def test_reviewed_approval_is_reused_across_model_versions():
+    rows = [history_row("v1", approved=ApprovalEnum.Approved.value, need_review=True, approved_by="admin")]
+    assert prior_verdict(rows, "v2") == (True, "phishing", "v1", True)
+
+
+def test_reviewed_rejection_blocks_the_current_verdict():
+    rows = [
+        history_row("v2", updated_at=NOW),
+        history_row("v2", approved=ApprovalEnum.Rejected.value, need_review=True, approved_by="admin",
+                    updated_at=NOW - timedelta(days=1)),
+    ]
+    assert prior_verdict(rows, "v2") is None